@@ -1,8 +1,252 @@
+import json
+import os
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from pyworkforce.queuing import MultiErlangC
+
+from perf_metrics import SweepMetrics, ThrottledProgress, enable_logging
+from scenario_planner import ScenarioPlanner
+from solution_cache import SolutionCache
+from staffing_engine import (INTERVAL_MINUTES, build_scenarios, build_total_staffing, calculate_portfolio, calculate_staffing,
+                             changed_cells, empty_table, evaluate_rosters, flatten_cells, forecast_dates, make_days,
+                             make_intervals, patch_staffing, portfolio_totals, prepare_forecast, scenario_daily_totals,
+                             scenario_label, summarize_rosters, summarize_scenarios)
+
+
+@st.cache_resource
+def shared_planner():
+    # One long-lived worker pool, shared across reruns and sessions, and an on-disk memo of
+    # solved scenarios that also survives restarts
+    return ScenarioPlanner(cache=SolutionCache())
+
+
+def get_planner(n_workers):
+    # Changing the sidebar's worker count shuts the old pool down instead of keeping one per count
+    planner = shared_planner()
+    planner.resize(n_workers)
+    return planner
+
+
+RESULTS_PAGE_SIZE = 25
+INTERVAL_LENGTHS = [5, 10, 15, 30, 60]
+MAX_HORIZON_WEEKS = 13
+
+
+def editable_table(name, days, intervals):
+    """
+    Shows the session's input table in an editor, starting over from zeros when the interval
+    length or horizon no longer matches its layout
+    """
+    table = st.session_state.get(name)
+    if table is None or not table.index.equals(pd.Index(intervals)) or list(table.columns) != list(days):
+        table = empty_table(days, intervals)
+    # The editor key follows the layout so edits made under another layout are not replayed
+    st.session_state[name] = st.data_editor(table, key=f"{name}_editor_{len(intervals)}_{len(days)}")
+    return st.session_state[name]
+
+
+def scenario_summary(snapshot, working_hours, working_days, metrics):
+    """
+    Returns the snapshot's Scenario Summary, built once per calculation and rebuilt only when
+    the working hours or days change, not on every widget interaction
+    """
+    key = (working_hours, working_days)
+    if snapshot.get("summary_key") != key:
+        with metrics.stage("summary"):
+            snapshot["summary"] = summarize_scenarios(snapshot["scenarios"], snapshot["frames"], snapshot["daily_totals"],
+                                                      working_hours, working_days, snapshot["days"], snapshot["interval_minutes"])
+        snapshot["summary_key"] = key
+    return snapshot["summary"]
+
+
+def render_results(snapshot, solve_stats, working_hours, working_days, days, intervals, interval_minutes, metrics):
+    """
+    Shows one cross-scenario summary and builds tables and charts only for the scenario the
+    user opens, timing each part into metrics
+    """
+    scenarios = snapshot["scenarios"]
+    staffing_frames = snapshot["frames"]
+    daily_totals = snapshot["daily_totals"]
+
+    if solve_stats.get("cells"):
+        st.caption(
+            f"Solved {solve_stats['solved']:,} unique cells for {solve_stats['cells']:,} scenario intervals "
+            f"({solve_stats['cache_hits']:,} served from the solution cache). "
+            f"Cache hit rate since start: {shared_planner().cache.hit_rate:.0%}"
+        )
+
+    st.header("Scenario Summary")
+    summary = scenario_summary(snapshot, working_hours, working_days, metrics)
+    pages = max(1, -(-len(summary) // RESULTS_PAGE_SIZE))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1) if pages > 1 else 1
+    page_rows = summary.iloc[(page - 1) * RESULTS_PAGE_SIZE:page * RESULTS_PAGE_SIZE]
+    st.dataframe(page_rows)
+
+    selected = st.selectbox(
+        "Open scenario",
+        options=range(len(scenarios)),
+        index=int(page_rows.index[0]) if len(page_rows) else 0,
+        format_func=lambda number: f"{number}: {scenario_label(scenarios[number])}",
+    )
+    scenario = scenarios[selected]
+    staffing_df = staffing_frames[selected]
+    label = scenario_label(scenario)
+
+    with metrics.stage("scenario tables"):
+        st.write(f"Staffing Requirements for {label}")
+        st.dataframe(staffing_df.reset_index(drop=True))
+
+        st.write("Total Staffing")
+        st.dataframe(build_total_staffing(daily_totals[selected], working_hours, working_days, days, interval_minutes))
+
+    chart = st.radio("Chart", ["None", "Heatmap", "Daily bar chart"], index=1, horizontal=True)
+    with metrics.stage("charts"):
+        render_chart(chart, scenario, staffing_df, label, days, intervals)
+
+
+def render_chart(chart, scenario, staffing_df, label, days, intervals):
+    if chart == "Heatmap":
+        # Interactive Heatmap
+        heatmap_data = staffing_df.pivot_table(index="Day", columns="Interval", values="positions", aggfunc="mean", observed=True)
+        heatmap_data = heatmap_data.reindex(days)
+        fig = go.Figure(data=go.Heatmap(
+            z=heatmap_data.values,
+            x=heatmap_data.columns,
+            y=heatmap_data.index,
+            colorscale='YlGnBu'
+        ))
+        fig.update_layout(
+            title=f'Staffing Levels Heatmap ({label})',
+            xaxis_nticks=48
+        )
+        st.plotly_chart(fig)
+    elif chart == "Daily bar chart":
+        day = st.selectbox("Day", days)
+        daily_staffing = staffing_df[staffing_df["Day"] == day]
+        fig = px.bar(daily_staffing, x="Interval", y="positions", title=f'Staffing Levels on {day} (Service Level Target: {scenario[4]}%)')
+        fig.update_xaxes(tickvals=[str(t) for t in intervals])
+        st.plotly_chart(fig)
+
+
+def performance_panel(calculation_metrics, render_metrics):
+    """
+    Sidebar panel with the stage timings and counters of the last calculation and of this
+    page render, plus a JSON export and an opt-in log record per calculation
+    """
+    with st.sidebar.expander("⏱️ Performance", expanded=False):
+        if calculation_metrics is None:
+            st.caption("Run a calculation to collect its timings.")
+        else:
+            st.write("Last calculation")
+            st.dataframe(calculation_metrics.as_frame())
+            st.dataframe(pd.Series(calculation_metrics.counters, name="count", dtype="int64"))
+        st.write("This page render")
+        st.dataframe(render_metrics.as_frame())
+
+        st.checkbox("Write calculation metrics to the log", key="log_metrics")
+        export = {"calculation": calculation_metrics.as_dict() if calculation_metrics is not None else None,
+                  "render": render_metrics.as_dict()}
+        st.download_button("Export metrics (JSON)", json.dumps(export, indent=2),
+                           file_name="staffing_metrics.json", mime="application/json")
+
+
+def portfolio_section(scenarios, working_hours, working_days, interval_minutes, solver_workers):
+    """
+    Sizes an uploaded long-format multi-queue forecast in one batch and shows its per-queue
+    and portfolio roll-ups
+    """
+    st.header("Portfolio Forecast (multiple queues and sites)")
+    st.caption("Upload a CSV or Parquet file with queue, site, date, interval, calls and aht (seconds) columns. "
+               "Without the AHT table method, the AHT values from the sidebar are used instead of the aht column. "
+               "The intervals must be a whole number of the sidebar's Interval Length apart; intervals with no calls may be left out.")
+    upload = st.file_uploader("Long-format forecast", type=["csv", "parquet"])
+    if upload is not None and st.button("Calculate Portfolio Staffing"):
+        try:
+            table = pd.read_parquet(upload) if upload.name.endswith(".parquet") else pd.read_csv(upload)
+            forecast = prepare_forecast(table, interval_minutes)
+        except ValueError as error:
+            st.error(str(error))
+            return
+
+        progress_bar = st.progress(0)
+        metrics = SweepMetrics()
+        try:
+            staffing = calculate_portfolio(
+                forecast, scenarios, planner=get_planner(int(solver_workers)),
+                progress=ThrottledProgress(lambda fraction: progress_bar.progress(fraction, text="Solving portfolio staffing")),
+                interval_minutes=interval_minutes,
+                metrics=metrics,
+            )
+        except ValueError as error:
+            progress_bar.empty()
+            st.error(str(error))
+            return
+        with metrics.stage("total_staffing"):
+            queue_totals, totals = portfolio_totals(staffing, scenarios, forecast_dates(forecast), working_hours, working_days, interval_minutes)
+        st.session_state["portfolio_snapshot"] = {"scenarios": scenarios, "queue_totals": queue_totals, "totals": totals}
+        record_calculation(metrics)
+        progress_bar.empty()
+
+    snapshot = st.session_state.get("portfolio_snapshot")
+    if snapshot is None:
+        return
+    st.write("Portfolio Total Staffing")
+    st.dataframe(snapshot["totals"])
+
+    scenarios = snapshot["scenarios"]
+    selected = st.selectbox("Portfolio scenario", options=range(len(scenarios)),
+                            format_func=lambda number: f"{number}: {scenario_label(scenarios[number])}")
+    queue_totals = snapshot["queue_totals"]
+    st.write("Total Staffing per Queue")
+    st.dataframe(queue_totals[queue_totals["Scenario"] == selected].reset_index(drop=True))
+    st.download_button("Download per-queue totals (CSV)", queue_totals.to_csv(index=False).encode(),
+                       file_name="queue_totals.csv", mime="text/csv")
+
+
+def roster_section(scenarios, calls_table, aht_table, days, intervals, interval_minutes, horizon):
+    """
+    Scores a staffing plan against the calls (and AHT) tables under every scenario in one batch
+    and shows the achieved service level, ASA, occupancy and waiting probability
+    """
+    st.header(f"What-if: Evaluate a Staffing Plan per {interval_minutes}-minute Interval ({horizon})")
+    st.caption("Enter the scheduled positions of each interval. Each scenario's shrinkage is taken off "
+               "(rounding down) before the plan is scored; ASA is in seconds.")
+    roster_table = editable_table("roster_df", days, intervals)
+    if st.button("Evaluate Staffing Plan"):
+        metrics = SweepMetrics()
+        try:
+            evaluation = evaluate_rosters(calls_table, aht_table, {"Plan": roster_table}, scenarios, days, intervals,
+                                          interval_minutes=interval_minutes, metrics=metrics)
+        except ValueError as error:
+            st.error(str(error))
+            return
+        with metrics.stage("summary"):
+            summary = summarize_rosters(evaluation, scenarios)
+        st.session_state["roster_snapshot"] = {"scenarios": scenarios, "evaluation": evaluation, "summary": summary}
+        record_calculation(metrics)
+
+    snapshot = st.session_state.get("roster_snapshot")
+    if snapshot is None:
+        return
+    st.write("Staffing Plan Summary")
+    st.dataframe(snapshot["summary"])
+
+    scenarios = snapshot["scenarios"]
+    selected = st.selectbox("Staffing plan scenario", options=range(len(scenarios)),
+                            format_func=lambda number: f"{number}: {scenario_label(scenarios[number])}")
+    evaluation = snapshot["evaluation"]
+    st.write(f"Achieved Service for {scenario_label(scenarios[selected])}")
+    st.dataframe(evaluation[evaluation["Scenario"] == selected].reset_index(drop=True))
+
+
+def record_calculation(metrics):
+    st.session_state["calculation_metrics"] = metrics
+    if st.session_state.get("log_metrics"):
+        enable_logging()
+        metrics.log()
+
 
 def main():
     # Set up the page configuration
@@ -30,6 +274,9 @@ def main():
 
         working_hours = st.number_input("Working Hours per Day", min_value=1.0, max_value=24.0, value=8.0, step=0.5)
         working_days = st.number_input("Working Days per Week", min_value=1.0, max_value=7.0, value=5.0, step=0.5)
+        interval_minutes = st.selectbox("Interval Length (minutes)", INTERVAL_LENGTHS, index=INTERVAL_LENGTHS.index(INTERVAL_MINUTES))
+        horizon_weeks = st.number_input("Planning Horizon (weeks)", min_value=1, max_value=MAX_HORIZON_WEEKS, value=1, step=1)
+        solver_workers = st.number_input("Solver Worker Processes", min_value=1, max_value=os.cpu_count() or 1, value=os.cpu_count() or 1, step=1)
 
         # Option to choose AHT input method
         aht_input_option = st.radio(
@@ -56,21 +303,34 @@ def main():
         - **Service Level Targets:** Set service level targets as percentages separated by commas. E.g., `80,85,90`.
         - **Working Hours per Day:** Specify the number of working hours per day.
         - **Working Days per Week:** Specify the number of working days per week.
+        - **Interval Length:** Choose 5, 10, 15, 30 or 60-minute intervals for the input tables.
+        - **Planning Horizon:** Plan a single week or up to 13 weeks; weekly totals are then averaged over the horizon.
 
         ### Step 2: Choose AHT Input Method
         - Select **"Multiple AHT values for all intervals and days"** if you wish to input AHT for all intervals and days at once.
         - Select **"AHT table at interval level for each day"** if you prefer to input AHT data per interval for each day individually.
 
         ### Step 3: Input Calls and AHT Data
-        - **Calls Offered:** Enter the number of calls offered for each 30-minute interval from Sunday to Saturday.
-        - **Average Handling Time (AHT):** If you chose the AHT table method, input AHT for each 30-minute interval for each day.
+        - **Calls Offered:** Enter the number of calls offered for each interval from Sunday to Saturday (of every week of the horizon).
+        - **Average Handling Time (AHT):** If you chose the AHT table method, input AHT for each interval for each day.
 
         ### Step 4: Calculate Staffing Requirements
         - Press the **"Calculate Staffing Requirements"** button to begin the calculation process. The app will compute staffing needs based on the inputs provided.
+        - Scenarios solved before, in this or an earlier session, come back from an on-disk solution cache.
 
         ### Step 5: Analyze the Results
-        - View detailed staffing requirements and total staffing needs displayed in tables.
-        - Explore interactive heatmaps and bar charts to visualize staffing levels across different days and intervals.
+        - Compare every scenario side by side in the **Scenario Summary** table (25 scenarios per page).
+        - Open a scenario to view its detailed staffing requirements and total staffing needs.
+        - Choose a heatmap or a daily bar chart to visualize staffing levels for the opened scenario.
+        - Open the **⏱️ Performance** panel in the sidebar to see how long each stage of the last calculation took, and export the timings as JSON.
+
+        ### Step 6 (optional): Size a Portfolio of Queues
+        - Upload a long-format forecast with **queue, site, date, interval, calls and aht** columns in the **Portfolio Forecast** section.
+        - Every queue is sized against the same scenarios in one run, with Total Staffing figures per queue and for the whole portfolio.
+
+        ### Step 7 (optional): Evaluate a Staffing Plan
+        - Enter the scheduled positions of a roster in the **What-if: Evaluate a Staffing Plan** table and press **"Evaluate Staffing Plan"**.
+        - Every scenario is scored against the calls (and AHT) tables: achieved service level, ASA, occupancy and waiting probability per interval, plus a summary per scenario.
 
         ### Tips:
         - Make sure to input realistic values for waiting times, shrinkage, and occupancy to get accurate staffing calculations.
@@ -79,227 +339,106 @@ def main():
         Feel free to experiment with different scenarios and adjust inputs to see how they affect staffing requirements. If you have any questions or feedback, please contact [Ashwin Nair](mailto:your-email@example.com).
         """)
 
-    # Input field for calls per interval for the whole week
-    st.header("Calls Offered per 30-minute Interval (Sunday to Saturday)")
-    intervals = pd.date_range("00:00", "23:30", freq="30min").time
-    days = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
-    data_calls = {day: [0.0] * len(intervals) for day in days}
-    calls_df = pd.DataFrame(data_calls, index=intervals)
-
-    if "calls_df" not in st.session_state:
-        st.session_state["calls_df"] = calls_df
-    st.session_state["calls_df"] = st.data_editor(st.session_state["calls_df"], key="calls_df_editor")
+    # Input field for calls per interval for the whole horizon
+    intervals = make_intervals(interval_minutes)
+    days = make_days(int(horizon_weeks))
+    horizon = "Sunday to Saturday" if horizon_weeks == 1 else f"Sunday to Saturday, {int(horizon_weeks)} weeks"
+    st.header(f"Calls Offered per {interval_minutes}-minute Interval ({horizon})")
+    editable_table("calls_df", days, intervals)
 
-    # Input field for AHT per interval for the whole week if table method is selected
+    # Input field for AHT per interval for the whole horizon if table method is selected
     if aht_input_option == "AHT table at interval level for each day":
-        st.header("Average Handling Time (AHT) per 30-minute Interval (Sunday to Saturday)")
-        data_aht = {day: [0.0] * len(intervals) for day in days}
-        aht_df = pd.DataFrame(data_aht, index=intervals)
-        
-        if "aht_df" not in st.session_state:
-            st.session_state["aht_df"] = aht_df
-        st.session_state["aht_df"] = st.data_editor(st.session_state["aht_df"], key="aht_df_editor")
-        aht_df = st.session_state["aht_df"]
+        st.header(f"Average Handling Time (AHT) per {interval_minutes}-minute Interval ({horizon})")
+        aht_df = editable_table("aht_df", days, intervals)
 
     # Button to calculate staffing requirements
     if st.button("Calculate Staffing Requirements"):
         progress_bar = st.progress(0)
-        total_combinations = (len(acceptable_waiting_times) * len(shrinkages) * len(max_occupancies) * len(service_level_targets) * len(days) * len(intervals))
-        current_progress = 0
-
-        for awt in acceptable_waiting_times:
-            for shrinkage in shrinkages:
-                for max_occupancy in max_occupancies:
-                    if aht_input_option == "Multiple AHT values for all intervals and days":
-                        for avg_aht in average_handling_times:
-                            for target in service_level_targets:
-                                staffing_results = []
-                                for day in days:
-                                    for interval, calls in zip(intervals, st.session_state["calls_df"][day]):
-                                        if calls == 0:
-                                            continue  # Skip intervals with no calls
-
-                                        param_grid = {"transactions": [calls], "aht": [avg_aht / 60], "interval": [30], "asa": [awt / 60], "shrinkage": [shrinkage / 100]}
-                                        multi_erlang = MultiErlangC(param_grid=param_grid, n_jobs=-1)
-
-                                        required_positions_scenarios = {"service_level": [target / 100], "max_occupancy": [max_occupancy / 100]}
-
-                                        positions_requirements = multi_erlang.required_positions(required_positions_scenarios)
-
-                                        for requirement in positions_requirements:
-                                            requirement.update({
-                                                "Day": day,
-                                                "Interval": interval,
-                                                "AWT": awt,
-                                                "Shrinkage": shrinkage,
-                                                "Max Occupancy": max_occupancy,
-                                                "Average AHT": avg_aht,
-                                                "Service Level Target": target,
-                                                "raw_positions": requirement.get("raw_positions", 0),
-                                                "positions": requirement.get("positions", 0),
-                                                "service_level": requirement.get("service_level", 0),
-                                                "occupancy": requirement.get("occupancy", 0),
-                                                "waiting_probability": requirement.get("waiting_probability", 0)
-                                            })
-                                            staffing_results.append(requirement)
-
-                                        current_progress += 1
-                                        progress_bar.progress(min(current_progress / total_combinations, 1.0))
-
-                                staffing_df = pd.DataFrame(staffing_results)
-                                
-                                # Check for missing columns and add them if needed
-                                required_columns = [
-                                    "Day", "Interval", "AWT", "Shrinkage", "Max Occupancy",
-                                    "Average AHT", "Service Level Target", "raw_positions", "positions",
-                                    "service_level", "occupancy", "waiting_probability"
-                                ]
-
-                                # Adding missing columns with default values
-                                for column in required_columns:
-                                    if column not in staffing_df.columns:
-                                        staffing_df[column] = 0
-
-                                # Filter only the required columns
-                                staffing_df = staffing_df[required_columns]
-
-                                st.write(f"Staffing Requirements for AWT: {awt}s, Shrinkage: {shrinkage}%, Max Occupancy: {max_occupancy}%, Average AHT: {avg_aht}s, Service Level Target: {target}%")
-                                st.dataframe(staffing_df)
-
-                                total_staffing = staffing_df.groupby("Day")[["raw_positions", "positions"]].sum()
-                                total_staffing["Sum of Raw Positions"] = total_staffing["raw_positions"]
-                                total_staffing["Sum of Positions"] = total_staffing["positions"]
-                                total_staffing["Divided by 2"] = total_staffing["Sum of Positions"] / 2
-                                total_staffing["Divided by Working Hours"] = total_staffing["Divided by 2"] / working_hours
-                                total_staffing["Maximum Value"] = total_staffing["Divided by Working Hours"].max()
-                                total_staffing["Sum of the Week"] = total_staffing["Divided by Working Hours"].sum()
-                                total_staffing["Divided by Working Days"] = total_staffing["Sum of the Week"] / working_days
-
-                                # Ensure the table is sorted from Sunday to Saturday
-                                total_staffing = total_staffing.reindex(["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"])
-                                
-                                st.write("Total Staffing")
-                                st.dataframe(total_staffing)
-
-                                # Interactive Heatmap
-                                st.write("Interactive Heatmap of Staffing Levels")
-                                heatmap_data = staffing_df.pivot_table(index="Day", columns="Interval", values="positions", aggfunc="mean")
-                                heatmap_data = heatmap_data.reindex(["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"])
-                                fig = go.Figure(data=go.Heatmap(
-                                    z=heatmap_data.values,
-                                    x=heatmap_data.columns,
-                                    y=heatmap_data.index,
-                                    colorscale='YlGnBu'
-                                ))
-                                fig.update_layout(
-                                    title=f'Staffing Levels Heatmap (AWT: {awt}s, Shrinkage: {shrinkage}%, Max Occupancy: {max_occupancy}%, Average AHT: {avg_aht}s, Service Level Target: {target}%)',
-                                    xaxis_nticks=48
-                                )
-                                st.plotly_chart(fig)
-
-                                # Interactive Plot in Expander
-                                with st.expander(f"Interactive Plot of Staffing Levels for AWT: {awt}s, Shrinkage: {shrinkage}%, Max Occupancy: {max_occupancy}%, Average AHT: {avg_aht}s, Service Level Target: {target}%"):
-                                    for day in days:
-                                        daily_staffing = staffing_df[staffing_df["Day"] == day]
-                                        fig = px.bar(daily_staffing, x="Interval", y="positions", title=f'Staffing Levels on {day} (Service Level Target: {target}%)')
-                                        fig.update_xaxes(tickvals=[str(t) for t in intervals])
-                                        st.plotly_chart(fig)
-
-                    else:
-                        for target in service_level_targets:
-                            staffing_results = []
-                            for day in days:
-                                for interval, calls, aht in zip(intervals, st.session_state["calls_df"][day], aht_df[day]):
-                                    if calls == 0 or aht == 0:
-                                        continue  # Skip intervals with no calls or no AHT
-
-                                    param_grid = {"transactions": [calls], "aht": [aht / 60], "interval": [30], "asa": [awt / 60], "shrinkage": [shrinkage / 100]}
-                                    multi_erlang = MultiErlangC(param_grid=param_grid, n_jobs=-1)
-
-                                    required_positions_scenarios = {"service_level": [target / 100], "max_occupancy": [max_occupancy / 100]}
-
-                                    positions_requirements = multi_erlang.required_positions(required_positions_scenarios)
-
-                                    for requirement in positions_requirements:
-                                        requirement.update({
-                                            "Day": day,
-                                            "Interval": interval,
-                                            "AWT": awt,
-                                            "Shrinkage": shrinkage,
-                                            "Max Occupancy": max_occupancy,
-                                            "Average AHT": aht,
-                                            "Service Level Target": target,
-                                            "raw_positions": requirement.get("raw_positions", 0),
-                                            "positions": requirement.get("positions", 0),
-                                            "service_level": requirement.get("service_level", 0),
-                                            "occupancy": requirement.get("occupancy", 0),
-                                            "waiting_probability": requirement.get("waiting_probability", 0)
-                                        })
-                                        staffing_results.append(requirement)
-
-                                    current_progress += 1
-                                    progress_bar.progress(min(current_progress / total_combinations, 1.0))
-
-                            staffing_df = pd.DataFrame(staffing_results)
-
-                            # Check for missing columns and add them if needed
-                            required_columns = [
-                                "Day", "Interval", "AWT", "Shrinkage", "Max Occupancy",
-                                "Average AHT", "Service Level Target", "raw_positions", "positions",
-                                "service_level", "occupancy", "waiting_probability"
-                            ]
-
-                            # Adding missing columns with default values
-                            for column in required_columns:
-                                if column not in staffing_df.columns:
-                                    staffing_df[column] = 0
-
-                            # Filter only the required columns
-                            staffing_df = staffing_df[required_columns]
-
-                            st.write(f"Staffing Requirements for AWT: {awt}s, Shrinkage: {shrinkage}%, Max Occupancy: {max_occupancy}%, Average AHT: {aht}s, Service Level Target: {target}%")
-                            st.dataframe(staffing_df)
-
-                            total_staffing = staffing_df.groupby("Day")[["raw_positions", "positions"]].sum()
-                            total_staffing["Sum of Raw Positions"] = total_staffing["raw_positions"]
-                            total_staffing["Sum of Positions"] = total_staffing["positions"]
-                            total_staffing["Divided by 2"] = total_staffing["Sum of Positions"] / 2
-                            total_staffing["Divided by Working Hours"] = total_staffing["Divided by 2"] / working_hours
-                            total_staffing["Maximum Value"] = total_staffing["Divided by Working Hours"].max()
-                            total_staffing["Sum of the Week"] = total_staffing["Divided by Working Hours"].sum()
-                            total_staffing["Divided by Working Days"] = total_staffing["Sum of the Week"] / working_days
-
-                            # Ensure the table is sorted from Sunday to Saturday
-                            total_staffing = total_staffing.reindex(["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"])
-                            
-                            st.write("Total Staffing")
-                            st.dataframe(total_staffing)
-
-                            # Interactive Heatmap
-                            st.write("Interactive Heatmap of Staffing Levels")
-                            heatmap_data = staffing_df.pivot_table(index="Day", columns="Interval", values="positions", aggfunc="mean")
-                            heatmap_data = heatmap_data.reindex(["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"])
-                            fig = go.Figure(data=go.Heatmap(
-                                z=heatmap_data.values,
-                                x=heatmap_data.columns,
-                                y=heatmap_data.index,
-                                colorscale='YlGnBu'
-                            ))
-                            fig.update_layout(
-                                title=f'Staffing Levels Heatmap (AWT: {awt}s, Shrinkage: {shrinkage}%, Max Occupancy: {max_occupancy}%, Average AHT: {aht}s, Service Level Target: {target}%)',
-                                xaxis_nticks=48
-                            )
-                            st.plotly_chart(fig)
-
-                            # Interactive Plot in Expander
-                            with st.expander(f"Interactive Plot of Staffing Levels for AWT: {awt}s, Shrinkage: {shrinkage}%, Max Occupancy: {max_occupancy}%, Average AHT: {aht}s, Service Level Target: {target}%"):
-                                for day in days:
-                                    daily_staffing = staffing_df[staffing_df["Day"] == day]
-                                    fig = px.bar(daily_staffing, x="Interval", y="positions", title=f'Staffing Levels on {day} (Service Level Target: {target}%)')
-                                    fig.update_xaxes(tickvals=[str(t) for t in intervals])
-                                    st.plotly_chart(fig)
+        metrics = SweepMetrics()
+
+        if aht_input_option == "Multiple AHT values for all intervals and days":
+            aht_table = None
+        else:
+            average_handling_times = None  # AHT comes from the interval table
+            aht_table = aht_df
+
+        scenarios = build_scenarios(acceptable_waiting_times, shrinkages, max_occupancies, average_handling_times, service_level_targets)
+
+        calls_table = st.session_state["calls_df"]
+
+        # Only re-solve the cells edited since the last calculation when the scenario grid,
+        # AHT method and table layout are unchanged
+        snapshot = st.session_state.get("staffing_snapshot")
+        snapshot_key = (tuple(scenarios), aht_table is None, tuple(days), tuple(intervals))
+        changed = None
+        if snapshot is not None and snapshot["key"] == snapshot_key:
+            changed = changed_cells(snapshot, calls_table, aht_table, days)
+
+        # Solve every interval of every scenario in one batched pass
+        # Re-clicking the button (or any widget) requests a rerun; the progress callback, which the
+        # planner calls on every poll of the pool, then raises and the chunks that have not started
+        # are cancelled. Batches solved inline are short and run to the end. The bar is redrawn a
+        # few times a second at most, however many chunks finish
+        solve_stats = {}
+        solved_frames = calculate_staffing(
+            calls_table, aht_table, scenarios, days, intervals,
+            planner=get_planner(int(solver_workers)),
+            progress=ThrottledProgress(lambda fraction: progress_bar.progress(fraction, text="Solving staffing requirements")),
+            stats=solve_stats,
+            cells=changed,
+            interval_minutes=interval_minutes,
+            metrics=metrics,
+        )
 
+        with metrics.stage("total_staffing"):
+            if changed is None:
+                staffing_frames = solved_frames
+                daily_totals = scenario_daily_totals(solved_frames, days)
+            else:
+                staffing_frames, daily_totals = [], []
+                for staffing_df, totals, update_df in zip(snapshot["frames"], snapshot["daily_totals"], solved_frames):
+                    staffing_df, totals = patch_staffing(staffing_df, totals, update_df, changed)
+                    staffing_frames.append(staffing_df)
+                    daily_totals.append(totals)
+
+        snapshot = st.session_state["staffing_snapshot"] = {
+            "key": snapshot_key,
+            "scenarios": scenarios,
+            "calls": flatten_cells(calls_table, days),
+            "aht": flatten_cells(aht_table, days) if aht_table is not None else None,
+            "frames": staffing_frames,
+            "daily_totals": daily_totals,
+            "days": days,
+            "intervals": intervals,
+            "interval_minutes": interval_minutes,
+        }
+        scenario_summary(snapshot, working_hours, working_days, metrics)
+
+        st.session_state["solve_stats"] = solve_stats
+        record_calculation(metrics)
         progress_bar.empty()  # Remove the progress bar once the results are updated
 
+    # Results are rendered from the stored snapshot, so browsing scenarios does not re-solve
+    render_metrics = SweepMetrics()
+    if "staffing_snapshot" in st.session_state:
+        snapshot = st.session_state["staffing_snapshot"]
+        render_results(snapshot, st.session_state.get("solve_stats", {}), working_hours, working_days,
+                       snapshot["days"], snapshot["intervals"], snapshot["interval_minutes"], render_metrics)
+
+    # The reverse what-if runs against the same inputs and scenarios as the calculation
+    plan_ahts, plan_aht_table = average_handling_times, None
+    if aht_input_option == "AHT table at interval level for each day":
+        plan_ahts, plan_aht_table = None, aht_df
+    plan_scenarios = build_scenarios(acceptable_waiting_times, shrinkages, max_occupancies, plan_ahts, service_level_targets)
+    roster_section(plan_scenarios, st.session_state["calls_df"], plan_aht_table, days, intervals, interval_minutes, horizon)
+
+    # Many queues at once: the AHT table method takes AHT from the forecast's aht column
+    portfolio_ahts = average_handling_times if aht_input_option == "Multiple AHT values for all intervals and days" else None
+    portfolio_scenarios = build_scenarios(acceptable_waiting_times, shrinkages, max_occupancies, portfolio_ahts, service_level_targets)
+    portfolio_section(portfolio_scenarios, working_hours, working_days, interval_minutes, solver_workers)
+
+    performance_panel(st.session_state.get("calculation_metrics"), render_metrics)
+
+
 if __name__ == "__main__":
     main()
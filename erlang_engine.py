@@ -0,0 +1,309 @@
+"""
+Vectorized Erlang C engine.
+
+Array counterpart of ``pyworkforce.queuing.ErlangC``: every function takes
+NumPy arrays (or scalars that broadcast against them) and solves all cells in
+one pass instead of building a solver object per interval. Units follow
+pyworkforce: ``aht``, ``asa`` and ``interval`` in minutes, ``shrinkage``,
+``service_level`` and ``max_occupancy`` as fractions in [0, 1].
+"""
+import numpy as np
+
+
+def _as_arrays(*values):
+    return np.broadcast_arrays(*[np.asarray(value, dtype=float) for value in values])
+
+
+def _validate(transactions, aht, asa, interval, shrinkage):
+    # NaN fails every comparison below, and a NaN or infinite load would never meet a target
+    for name, values in [("transactions", transactions), ("aht", aht), ("asa", asa), ("interval", interval),
+                         ("shrinkage", shrinkage)]:
+        if not np.all(np.isfinite(values)):
+            raise ValueError(f"{name} can't be NaN or infinite")
+    if np.any(transactions <= 0):
+        raise ValueError("transactions can't be smaller or equals than 0")
+    if np.any(aht <= 0):
+        raise ValueError("aht can't be smaller or equals than 0")
+    if np.any(asa <= 0):
+        raise ValueError("asa can't be smaller or equals than 0")
+    if np.any(interval <= 0):
+        raise ValueError("interval can't be smaller or equals than 0")
+    if np.any((shrinkage < 0) | (shrinkage >= 1)):
+        raise ValueError("shrinkage must be between in the interval [0,1)")
+
+
+# Recurrence terms more than this many standard deviations below the offered load are smaller
+# than double precision relative to the sum, so the recurrence can start there
+TRUNCATION_SDS = 10
+# The recurrence runs on mantissas scaled by exp(-scale); mantissas above this are folded into the scale
+RESCALE_LIMIT = 1e250
+
+
+def _truncation_start(load, positions):
+    return np.maximum(0, np.floor(np.minimum(positions, load) - TRUNCATION_SDS * np.sqrt(load) - 5))
+
+
+class _InverseRecurrence:
+    """
+    Steps the Erlang B recurrence ``inv_k = 1 + inv_(k-1) * k / A`` of many cells in lockstep.
+
+    ``inv`` is held as ``mantissa * exp(scale)`` so queues of thousands of agents never overflow,
+    while each step stays two multiplications and an addition: with ``unit = exp(-scale)``,
+    ``mantissa_k = unit + mantissa_(k-1) * k / A``, and ``ErlangB = unit / mantissa``.
+    """
+
+    def __init__(self, load, positions, log_inverse):
+        self.inverse_load = 1 / load
+        self.positions = positions.astype(float)
+        self.scale = np.asarray(log_inverse, dtype=float).copy()
+        self.unit = np.exp(-self.scale)
+        self.mantissa = np.ones_like(self.scale)
+
+    def take(self, rows):
+        self.inverse_load, self.positions, self.scale, self.unit, self.mantissa = (
+            values[rows] for values in (self.inverse_load, self.positions, self.scale, self.unit, self.mantissa))
+
+    def step(self, active=None):
+        """
+        Advances the first ``active`` cells (all by default) by one position
+        """
+        positions, mantissa = self.positions[:active], self.mantissa[:active]
+        positions += 1
+        mantissa *= positions * self.inverse_load[:active]
+        mantissa += self.unit[:active]
+        if mantissa.max() > RESCALE_LIMIT:
+            rows = np.flatnonzero(mantissa > RESCALE_LIMIT)
+            mantissa[rows] /= RESCALE_LIMIT
+            self.scale[rows] += np.log(RESCALE_LIMIT)
+            self.unit[rows] = np.exp(-self.scale[rows])
+
+    def erlang_b(self):
+        return self.unit / self.mantissa
+
+    def log_inverse(self):
+        return self.scale + np.log(self.mantissa)
+
+
+def _advance_log_inverse(load, start, log_inverse, stop):
+    """
+    Returns ``log(1 / ErlangB(stop, A))`` for every cell given its value at ``start``
+    """
+    steps = np.maximum(stop - start, 0).astype(np.int64)
+    if not len(steps) or steps.max() == 0:
+        return np.array(log_inverse, dtype=float)
+
+    # Longest runs first, so the cells still stepping are always a leading slice
+    order = np.argsort(-steps, kind="stable")
+    recurrence = _InverseRecurrence(load[order], start[order], log_inverse[order])
+    active = np.searchsorted(-steps[order], -np.arange(1, steps.max() + 1), side="right")
+    for count in active:
+        recurrence.step(count)
+
+    result = np.empty_like(recurrence.scale)
+    result[order] = recurrence.log_inverse()
+    return result
+
+
+def _log_erlang_b_inverse(load, positions):
+    """
+    Returns ``log(1 / ErlangB(positions, A))`` for every cell
+    """
+    if np.ndim(load) != 1:
+        shape = np.shape(load)
+        return _log_erlang_b_inverse(np.ravel(load), np.ravel(positions)).reshape(shape)
+
+    # Sweeps repeat the same load across waiting time and target scenarios, so each distinct
+    # (load, positions) pair is evaluated once
+    order = np.lexsort((positions, load))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (np.diff(load[order]) != 0) | (np.diff(positions[order]) != 0)
+    if not first.all():
+        pair_index = np.empty(len(order), dtype=np.int64)
+        pair_index[order] = np.cumsum(first) - 1
+        return _log_erlang_b_inverse(load[order][first], positions[order][first])[pair_index]
+
+    start = _truncation_start(load, positions)
+    return _advance_log_inverse(load, start, np.zeros_like(load), positions)
+
+
+def _erlang_c(positions, intensity, erlang_b):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return positions * erlang_b / (positions - intensity * (1 - erlang_b))
+
+
+def _service_level(positions, intensity, probability_wait, asa, aht):
+    exponential = np.exp(-(positions - intensity) * (asa / aht))
+    return np.maximum(0, 1 - (probability_wait * exponential))
+
+
+def required_positions(transactions, aht, asa, shrinkage, service_level, max_occupancy=1.0, interval=30):
+    """
+    Computes the staffing requirements of every cell at once.
+
+    Mirrors ``ErlangC.required_positions``: the answer is the smallest number of positions from
+    ``round(A + 1)`` upwards that meets the service level target, capped by ``max_occupancy``
+    and grossed up for shrinkage. Erlang B is seeded from a truncated recurrence that starts a
+    few standard deviations below the load rather than at zero and is kept rescaled, so queues
+    of thousands of agents neither overflow nor iterate from zero. Positions below
+    ``A / max_occupancy`` always give way to the occupancy cap, so the search starts there.
+
+    Parameters
+    ----------
+
+    transactions: array-like,
+        The number of transactions that come in each interval.
+    aht: array-like,
+        Average handling time of a transaction (minutes).
+    asa: array-like,
+        The required average speed of answer (minutes).
+    shrinkage: array-like,
+        Percentage of time that an operator unit is not available.
+    service_level: array-like,
+        Target service level.
+    max_occupancy: array-like, default=1.0
+        The maximum fraction of time that a transaction can occupy a position.
+    interval: array-like, default=30
+        Interval length (minutes) where the transactions come in.
+
+    Returns
+    -------
+
+    dict of arrays with the keys ``raw_positions``, ``positions``, ``service_level``,
+    ``occupancy`` and ``waiting_probability``, one element per cell.
+    """
+    transactions, aht, asa, shrinkage, target, max_occupancy, interval = _as_arrays(
+        transactions, aht, asa, shrinkage, service_level, max_occupancy, interval)
+    _validate(transactions, aht, asa, interval, shrinkage)
+
+    if not np.all((target >= 0) & (target <= 1)):
+        raise ValueError("service_level must be between 0 and 1")
+    if not np.all((max_occupancy > 0) & (max_occupancy <= 1)):
+        raise ValueError("max_occupancy must be between 0 and 1")
+
+    shape = transactions.shape
+    transactions, aht, asa, shrinkage, target, max_occupancy, interval = [
+        values.ravel() for values in (transactions, aht, asa, shrinkage, target, max_occupancy, interval)]
+
+    load = (transactions / interval) * aht
+    # Any answer below A / max_occupancy is replaced by the occupancy cap's ceil(A / max_occupancy),
+    # which meets the target as well, so the search can start at that floor
+    start = np.maximum(np.round(load + 1), np.ceil(load / max_occupancy)) - 1
+    log_inverse = _log_erlang_b_inverse(load, start)
+
+    # All cells climb one position per step together; cells leave the batch as they meet the target
+    positions = np.zeros_like(load)
+    position_log_inverse = np.zeros_like(load)
+    achieved_service_level = np.zeros_like(load)
+    pending = np.arange(len(load))
+    recurrence = _InverseRecurrence(load, start, log_inverse)
+    pending_load, pending_asa, pending_aht, pending_target = load, asa, aht, target
+    while len(pending):
+        recurrence.step()
+        candidates = recurrence.positions
+        probability_wait = _erlang_c(candidates, pending_load, recurrence.erlang_b())
+        candidate_service_level = _service_level(candidates, pending_load, probability_wait, pending_asa, pending_aht)
+        meets = candidate_service_level >= pending_target
+        if not meets.any():
+            continue
+        rows = pending[meets]
+        positions[rows] = candidates[meets]
+        position_log_inverse[rows] = recurrence.scale[meets] + np.log(recurrence.mantissa[meets])
+        achieved_service_level[rows] = candidate_service_level[meets]
+
+        keep = ~meets
+        pending = pending[keep]
+        recurrence.take(keep)
+        pending_load, pending_asa, pending_aht, pending_target = (
+            values[keep] for values in (pending_load, pending_asa, pending_aht, pending_target))
+
+    achieved_occupancy = load / positions
+    raw_positions = positions
+
+    # Occupancy cap: staff up to A / max_occupancy where the service level solution runs too hot
+    capped = achieved_occupancy > max_occupancy
+    if capped.any():
+        raw_positions = np.where(capped, np.ceil(load / max_occupancy), positions)
+        position_log_inverse[capped] = _advance_log_inverse(
+            load[capped], positions[capped], position_log_inverse[capped], raw_positions[capped])
+        achieved_occupancy = np.where(capped, load / raw_positions, achieved_occupancy)
+        capped_wait = _erlang_c(raw_positions[capped], load[capped], np.exp(-position_log_inverse[capped]))
+        achieved_service_level[capped] = _service_level(
+            raw_positions[capped], load[capped], capped_wait, asa[capped], aht[capped])
+
+    probability_wait = _erlang_c(raw_positions, load, np.exp(-position_log_inverse))
+    scheduled_positions = np.ceil(raw_positions / (1 - shrinkage))
+
+    return {"raw_positions": raw_positions.astype(np.int64).reshape(shape),
+            "positions": scheduled_positions.astype(np.int64).reshape(shape),
+            "service_level": achieved_service_level.reshape(shape),
+            "occupancy": achieved_occupancy.reshape(shape),
+            "waiting_probability": probability_wait.reshape(shape)}
+
+
+def achieved_service(transactions, aht, asa, positions, shrinkage=0.0, interval=30):
+    """
+    Evaluates a given staffing level in every cell at once, the reverse of required_positions.
+
+    Scheduled ``positions`` lose ``shrinkage`` to productive positions, rounded down to whole
+    agents; the productive positions then serve the offered load. Cells whose productive
+    positions do not exceed the load cannot keep up: their service level is 0, every
+    transaction waits and the average speed of answer is infinite.
+
+    Parameters
+    ----------
+
+    transactions: array-like,
+        The number of transactions that come in each interval.
+    aht: array-like,
+        Average handling time of a transaction (minutes).
+    asa: array-like,
+        The target answer time the service level is measured against (minutes).
+    positions: array-like,
+        Scheduled positions in each interval, before shrinkage.
+    shrinkage: array-like, default=0.0
+        Percentage of time that an operator unit is not available.
+    interval: array-like, default=30
+        Interval length (minutes) where the transactions come in.
+
+    Returns
+    -------
+
+    dict of arrays with the keys ``productive_positions``, ``service_level``, ``asa`` (the
+    average speed of answer, in minutes), ``occupancy`` and ``waiting_probability``, one
+    element per cell.
+    """
+    transactions, aht, asa, positions, shrinkage, interval = _as_arrays(
+        transactions, aht, asa, positions, shrinkage, interval)
+    _validate(transactions, aht, asa, interval, shrinkage)
+    if not np.all(np.isfinite(positions)):
+        raise ValueError("positions can't be NaN or infinite")
+    if np.any(positions < 0):
+        raise ValueError("positions can't be smaller than 0")
+
+    shape = transactions.shape
+    transactions, aht, asa, positions, shrinkage, interval = [
+        values.ravel() for values in (transactions, aht, asa, positions, shrinkage, interval)]
+
+    load = (transactions / interval) * aht
+    # Rounded first so that e.g. 100 * (1 - 0.29) = 70.99999999999999 still gives 71 agents
+    productive_positions = np.floor(np.round(positions * (1 - shrinkage), 9))
+
+    achieved_service_level = np.zeros_like(load)
+    speed_of_answer = np.full_like(load, np.inf)
+    achieved_occupancy = np.ones_like(load)
+    probability_wait = np.ones_like(load)
+    stable = productive_positions > load
+    if stable.any():
+        servers, offered = productive_positions[stable], load[stable]
+        waiting = _erlang_c(servers, offered, np.exp(-_log_erlang_b_inverse(offered, servers)))
+        probability_wait[stable] = waiting
+        achieved_service_level[stable] = _service_level(servers, offered, waiting, asa[stable], aht[stable])
+        speed_of_answer[stable] = waiting * aht[stable] / (servers - offered)
+        achieved_occupancy[stable] = offered / servers
+
+    return {"productive_positions": productive_positions.astype(np.int64).reshape(shape),
+            "service_level": achieved_service_level.reshape(shape),
+            "asa": speed_of_answer.reshape(shape),
+            "occupancy": achieved_occupancy.reshape(shape),
+            "waiting_probability": probability_wait.reshape(shape)}
+
@@ -0,0 +1,92 @@
+"""
+Lightweight instrumentation for the staffing sweep.
+
+SweepMetrics accumulates wall time per named stage (building jobs, cache lookups, solving,
+building the staffing tables, roll-ups, charts, ...) and named counters (cells, solves, cache
+hits, rows produced), and exports them as a dict, JSON or a log record. ThrottledProgress caps
+how often progress callbacks reach the UI.
+"""
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+logger = logging.getLogger("staffing")
+
+# Progress bars are redrawn at most this often (seconds)
+PROGRESS_INTERVAL = 0.2
+
+
+def enable_logging(level=logging.INFO):
+    """
+    Sends metrics records to stderr (once per process) when the host has not configured logging
+    """
+    logger.setLevel(level)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(levelname)s %(message)s"))
+        logger.addHandler(handler)
+
+
+class SweepMetrics:
+    """
+    Stage timers and counters of one calculation
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times the enclosed block and adds it to the stage's total; stages may nest
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            totals = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            totals["seconds"] += time.perf_counter() - started
+            totals["calls"] += 1
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def seconds(self, name):
+        return self.stages.get(name, {}).get("seconds", 0.0)
+
+    def as_dict(self):
+        return {"stages": {name: dict(totals) for name, totals in self.stages.items()}, "counters": dict(self.counters)}
+
+    def as_frame(self):
+        """
+        Returns the stages as a table indexed by stage name, in the order they first ran
+        """
+        return pd.DataFrame.from_dict(self.stages, orient="index", columns=["seconds", "calls"]).rename_axis("stage")
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.as_dict(), **kwargs)
+
+    def log(self, level=logging.INFO):
+        logger.log(level, "staffing metrics %s", self.to_json())
+
+
+class ThrottledProgress:
+    """
+    Wraps a progress callback so it runs at most once every min_interval seconds; the final
+    update (fraction 1.0) is always delivered
+    """
+
+    def __init__(self, callback, min_interval=PROGRESS_INTERVAL):
+        self.callback = callback
+        self.min_interval = min_interval
+        self._last = None
+
+    def __call__(self, fraction):
+        now = time.monotonic()
+        if fraction >= 1 or self._last is None or now - self._last >= self.min_interval:
+            self._last = now
+            self.callback(fraction)
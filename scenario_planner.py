@@ -0,0 +1,232 @@
+"""
+Chunked, process-parallel dispatch of Erlang C jobs.
+
+The planner takes every (interval, scenario) cell of a sweep as flat arrays, serves the
+scenarios it has seen before from an optional SolutionCache, collapses duplicate cells among
+the rest, splits them into a handful of large chunks and solves those on one long-lived process pool. Small batches are
+solved inline, where starting workers would cost more than the maths.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+import erlang_engine
+from perf_metrics import SweepMetrics
+from solution_cache import normalize_keys, solution_key
+
+JOB_FIELDS = ["transactions", "aht", "asa", "shrinkage", "service_level", "max_occupancy", "interval"]
+RESULT_FIELDS = ["raw_positions", "positions", "service_level", "occupancy", "waiting_probability"]
+# Seconds between checks on the pool's chunks (and calls to the progress callback)
+POLL_INTERVAL = 0.25
+
+
+def _empty_results(n_cells):
+    return {field: np.zeros(n_cells, dtype=np.int64 if field.endswith("positions") else float)
+            for field in RESULT_FIELDS}
+
+
+def _unique_rows(keys):
+    """
+    Returns (first, inverse) of a key matrix: the position of the first row of each distinct
+    key, in order of appearance, and the distinct key of every row. Each column is factorized by
+    hashing and the codes are folded into one integer per row, which costs a fraction of
+    np.unique(axis=0)'s lexicographic row sort.
+    """
+    row_codes = np.zeros(len(keys), dtype=np.int64)
+    for column in keys.T:
+        codes, uniques = pd.factorize(column)
+        row_codes, _ = pd.factorize(row_codes * len(uniques) + codes)
+    first = np.empty(row_codes.max() + 1 if len(row_codes) else 0, dtype=np.int64)
+    first[row_codes[::-1]] = np.arange(len(row_codes) - 1, -1, -1)
+    return first, row_codes
+
+
+def _solve_chunk(chunk):
+    return erlang_engine.required_positions(**chunk)
+
+
+class ScenarioPlanner:
+    """
+    Solves batches of Erlang C jobs on a persistent process pool.
+
+    Parameters
+    ----------
+
+    n_workers: int, default=None
+        Number of worker processes. None uses all CPUs; 1 solves everything inline.
+    min_parallel_cells: int, default=100000
+        Batches with fewer cells than this are solved inline.
+    chunks_per_worker: int, default=2
+        Number of chunks handed to each worker, so a slow chunk does not leave the others idle.
+    cache: SolutionCache, default=None
+        Memoization store consulted before solving and filled with every new solution.
+    """
+
+    def __init__(self, n_workers=None, min_parallel_cells=100_000, chunks_per_worker=2, cache=None):
+        self.n_workers = max(1, n_workers or os.cpu_count() or 1)
+        self.cache = cache
+        self.min_parallel_cells = min_parallel_cells
+        self.chunks_per_worker = chunks_per_worker
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn keeps the workers independent of the (threaded) host process
+                self._executor = ProcessPoolExecutor(max_workers=self.n_workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def resize(self, n_workers):
+        """
+        Changes the number of worker processes. The current pool is shut down (chunks already
+        submitted to it still finish) and a pool of the new size starts on next use.
+        """
+        n_workers = max(1, n_workers or os.cpu_count() or 1)
+        with self._lock:
+            if n_workers == self.n_workers:
+                return
+            self.n_workers = n_workers
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def solve(self, jobs, progress=None, stats=None, metrics=None, groups=None):
+        """
+        Solves all jobs and returns the engine results in the input order.
+
+        With a cache attached, each group of jobs that was solved before (e.g. a scenario of an
+        earlier run) is served from it whole. Of the rest, jobs whose normalized keys match are
+        solved once, from the inputs of the first of them, so results equal
+        erlang_engine.required_positions on the same jobs.
+
+        Parameters
+        ----------
+
+        jobs: dict,
+            erlang_engine.required_positions keyword arguments, each a 1-d array of equal length
+            (scalars are broadcast).
+        progress: callable, default=None
+            Called with the fraction of cells solved while the pool works, at least every
+            POLL_INTERVAL seconds. Exceptions raised by the callback (e.g. a Streamlit rerun)
+            cancel the chunks that have not started yet. Batches solved inline call it once
+            they are done.
+        stats: dict, default=None
+            Filled with the "cells", "cache_hits" (cells served from the cache), "unique_cells"
+            (distinct cells among the rest) and "solved" counts of this call.
+        metrics: SweepMetrics, default=None
+            Receives the same counts and the time spent deduplicating, in the cache and solving.
+        groups: list of int, default=None
+            Lengths of the consecutive runs of jobs cached as one entry, such as each scenario's
+            intervals. None caches the whole batch as one entry.
+        """
+        metrics = metrics if metrics is not None else SweepMetrics()
+        columns = np.broadcast_arrays(*[np.asarray(jobs[field], dtype=float) for field in JOB_FIELDS])
+        n_cells = len(columns[0])
+        counts = {"cells": n_cells, "cache_hits": 0, "unique_cells": 0, "solved": 0}
+        if stats is not None:
+            stats.update(counts)
+        if n_cells == 0:
+            return _empty_results(0)
+
+        with metrics.stage("dedupe"):
+            keys = normalize_keys(np.column_stack(columns))
+
+        results = _empty_results(n_cells)
+        pending = np.ones(n_cells, dtype=bool)
+        entries = {}
+        if self.cache is not None:
+            with metrics.stage("cache lookup"):
+                bounds = np.cumsum([0, *(groups if groups is not None else [n_cells])])
+                for start, stop in zip(bounds[:-1], bounds[1:]):
+                    if stop > start:
+                        entries.setdefault(solution_key(keys[start:stop]), []).append(slice(start, stop))
+                for key, cached in self.cache.get(list(entries)).items():
+                    for rows in entries.pop(key):
+                        for field in RESULT_FIELDS:
+                            results[field][rows] = cached[field]
+                        pending[rows] = False
+
+        # Normalized keys only group duplicates (and address the cache); the jobs solved are the
+        # first original row of each group, not the rounded key
+        missing = np.flatnonzero(pending)
+        with metrics.stage("dedupe"):
+            first, inverse = _unique_rows(keys[missing])
+        counts["cache_hits"] = n_cells - len(missing)
+        counts["unique_cells"] = counts["solved"] = len(first)
+        if stats is not None:
+            stats.update(counts)
+        for name, value in counts.items():
+            metrics.count(name, value)
+
+        if len(missing):
+            with metrics.stage("erlang solve"):
+                rows = missing[first]
+                solved = self._dispatch({field: values[rows] for field, values in zip(JOB_FIELDS, columns)},
+                                        progress=progress, metrics=metrics)
+            for field in RESULT_FIELDS:
+                results[field][missing] = solved[field][inverse]
+            if self.cache is not None:
+                with metrics.stage("cache store"):
+                    self.cache.put({key: {field: results[field][ranges[0]] for field in RESULT_FIELDS}
+                                    for key, ranges in entries.items()})
+        elif progress is not None:
+            progress(1.0)
+
+        return results
+
+    def _dispatch(self, jobs, progress=None, metrics=None):
+        metrics = metrics if metrics is not None else SweepMetrics()
+        n_cells = len(jobs["transactions"])
+
+        if self.n_workers == 1 or n_cells < self.min_parallel_cells:
+            results = _solve_chunk(jobs)
+            if progress is not None:
+                progress(1.0)
+            return results
+
+        # Group similar loads together so each chunk's recurrence stops near its own maximum
+        order = np.argsort(jobs["transactions"] * jobs["aht"] / jobs["interval"], kind="stable")
+        n_chunks = min(n_cells, self.n_workers * self.chunks_per_worker)
+        bounds = np.linspace(0, n_cells, n_chunks + 1).astype(int)
+
+        # Starting the pool (first use only) and pickling the chunks to the workers
+        with metrics.stage("pool submit"):
+            executor = self._get_executor()
+            futures = {}
+            for start, stop in zip(bounds[:-1], bounds[1:]):
+                rows = order[start:stop]
+                futures[executor.submit(_solve_chunk, {field: values[rows] for field, values in jobs.items()})] = rows
+        metrics.count("chunks", len(futures))
+
+        results = _empty_results(n_cells)
+        pending = set(futures)
+        solved = 0
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    rows = futures[future]
+                    for field, values in future.result().items():
+                        results[field][rows] = values
+                    solved += len(rows)
+                # Called on every poll, not only when a chunk finishes, so a host that signals a
+                # rerun through the callback (Streamlit) gets to do so while long chunks run
+                if progress is not None:
+                    progress(solved / n_cells)
+        finally:
+            for future in pending:
+                future.cancel()
+
+        return results
@@ -0,0 +1,128 @@
+"""
+Persistent memoization of Erlang C solutions.
+
+Solutions are stored a batch of cells at a time (one scenario's intervals, typically), keyed
+on a hash of the cells' normalized (transactions, aht, asa, shrinkage, service level target,
+max occupancy, interval) tuples, in SQLite, so they survive Streamlit reruns and app restarts.
+A rerun then costs one hash and one row fetch per scenario instead of a lookup per cell. The
+store is bounded to max_cells solved cells and evicts the least recently used entries.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+RESULT_COLUMNS = ["raw_positions", "positions", "service_level", "occupancy", "waiting_probability"]
+KEY_DECIMALS = 9
+# Entries fetched per query, below SQLite's limit on bound parameters
+QUERY_BATCH = 500
+
+DEFAULT_CACHE_PATH = os.environ.get("STAFFING_CACHE_PATH", "staffing_cache.sqlite")
+
+
+def normalize_keys(keys):
+    """
+    Rounds a (n, 7) key matrix so that equal inputs reached through different unit
+    conversions (e.g. 300 / 60 and 5.0) share one cache entry
+    """
+    return np.round(np.asarray(keys, dtype=float), KEY_DECIMALS) + 0.0  # + 0.0 folds -0.0 into 0.0
+
+
+def solution_key(keys):
+    """
+    Returns the cache key of a batch of cells: a digest of its normalized key matrix, cell order included
+    """
+    return hashlib.sha256(np.ascontiguousarray(keys, dtype=float).tobytes()).hexdigest()
+
+
+class SolutionCache:
+    """
+    SQLite-backed LRU cache of required_positions solutions.
+
+    Parameters
+    ----------
+
+    path: str, default=DEFAULT_CACHE_PATH
+        Location of the SQLite database, ":memory:" keeps it in process.
+    max_cells: int, default=5000000
+        Maximum number of solved cells stored (about 40 bytes each) before the least recently
+        used entries are evicted.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_cells=5_000_000):
+        self.path = path
+        self.max_cells = max_cells
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS batch_solutions (key TEXT PRIMARY KEY, cells INTEGER NOT NULL, "
+                "results BLOB NOT NULL, last_used INTEGER NOT NULL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS batch_solutions_last_used ON batch_solutions (last_used)")
+        self._clock = self._connection.execute("SELECT COALESCE(MAX(last_used), 0) FROM batch_solutions").fetchone()[0]
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM batch_solutions").fetchone()[0]
+
+    def get(self, keys):
+        """
+        Looks up solution_key digests, returning {key: results} for the ones stored, where
+        results holds one array per result column
+        """
+        keys = list(dict.fromkeys(keys))
+        rows = []
+        with self._lock, self._connection:
+            self._clock += 1
+            for start in range(0, len(keys), QUERY_BATCH):
+                batch = keys[start:start + QUERY_BATCH]
+                placeholders = ", ".join("?" * len(batch))
+                rows += self._connection.execute(
+                    f"SELECT key, results FROM batch_solutions WHERE key IN ({placeholders})", batch).fetchall()
+                self._connection.execute(
+                    f"UPDATE batch_solutions SET last_used = ? WHERE key IN ({placeholders})", (self._clock, *batch))
+
+        found = {}
+        for key, blob in rows:
+            values = np.frombuffer(blob, dtype=float).reshape(len(RESULT_COLUMNS), -1)
+            found[key] = {column: values[position].astype(np.int64) if column.endswith("positions") else values[position].copy()
+                          for position, column in enumerate(RESULT_COLUMNS)}
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put(self, solutions):
+        """
+        Stores {key: results} solutions and evicts the least recently used entries beyond
+        max_cells
+        """
+        if not solutions:
+            return
+        entries = []
+        for key, results in solutions.items():
+            values = np.stack([np.asarray(results[column], dtype=float) for column in RESULT_COLUMNS])
+            entries.append((key, values.shape[1], values.tobytes()))
+        with self._lock, self._connection:
+            self._clock += 1
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO batch_solutions (key, cells, results, last_used) VALUES (?, ?, ?, ?)",
+                ((*entry, self._clock) for entry in entries))
+            # Keep the most recently used entries that fit in max_cells
+            self._connection.execute(
+                "DELETE FROM batch_solutions WHERE key IN (SELECT key FROM (SELECT key, SUM(cells) OVER "
+                "(ORDER BY last_used DESC, rowid DESC) AS kept FROM batch_solutions) WHERE kept > ?)", (self.max_cells,))
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM batch_solutions")
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,272 @@
+"""
+Benchmark harness for the staffing sweep.
+
+Generates synthetic weekly calls and AHT curves at several sizes, times the sweep end to end
+and per stage (solving, building the staffing tables, the Total Staffing roll-up, the
+Scenario Summary and chart building), checks a sample of cells against the pyworkforce MultiErlangC baseline and writes
+the results as JSON, so runs can be compared release over release.
+
+Example:
+
+    python staffing_benchmark.py --sizes small,medium --repeat 3 --output bench_output.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    # Imported (and warmed up in main) before any timer starts, so the charts stage times
+    # building figures, not loading plotly
+    import plotly.express as px
+    import plotly.graph_objects as go
+except ImportError:
+    px = go = None
+
+from perf_metrics import SweepMetrics
+from scenario_planner import ScenarioPlanner
+from staffing_engine import (build_scenarios, build_total_staffing, calculate_staffing, make_days, make_intervals,
+                             scenario_daily_totals, summarize_scenarios)
+
+# name: (weeks, interval minutes, daily calls, AHT table base seconds or None,
+#        scenario grid as awt, shrinkage, max occupancy, aht (None with an AHT table), target)
+SIZES = {
+    "small": (1, 30, 2_000, None, ([20], [30], [85], [300], [80, 90])),
+    "medium": (1, 30, 10_000, 300, ([10, 20, 30], [20, 30, 40], [70, 80, 90], None, [80, 85, 90])),
+    "large": (4, 15, 25_000, None, ([10, 20, 30], [20, 30, 40], [70, 80, 90], [240, 300, 360], [80, 90])),
+    "huge": (13, 5, 100_000, 300, ([20, 30], [30], [80, 90], None, [80, 90])),
+}
+# Relative volume of each day, Sunday to Saturday
+WEEKDAY_WEIGHTS = np.array([0.55, 1.15, 1.1, 1.05, 1.05, 1.0, 0.7])
+WORKING_HOURS = 8.0
+WORKING_DAYS = 5.0
+
+
+def synthetic_calls(days, intervals, daily_calls, rng):
+    """
+    Returns an (intervals x days) calls table with a contact-centre shape: quiet nights, a
+    morning and an early-afternoon peak, lighter weekends and Poisson noise
+    """
+    hours = np.array([interval.hour + interval.minute / 60 for interval in intervals])
+    shape = (0.02
+             + np.exp(-0.5 * ((hours - 10.5) / 1.8) ** 2)
+             + 0.8 * np.exp(-0.5 * ((hours - 14.5) / 2.2) ** 2))
+    shape /= shape.sum()
+    weights = np.resize(WEEKDAY_WEIGHTS, len(days)) * rng.uniform(0.9, 1.1, len(days))
+    expected = np.outer(shape, weights * daily_calls)
+    return pd.DataFrame(rng.poisson(expected).astype(np.float32), index=intervals, columns=days)
+
+
+def synthetic_aht(days, intervals, base_seconds, rng):
+    """
+    Returns an (intervals x days) AHT table (seconds) that runs longer overnight and drifts
+    slowly through the day
+    """
+    hours = np.array([interval.hour + interval.minute / 60 for interval in intervals])
+    shape = 1 + 0.15 * np.cos((hours - 3) / 24 * 2 * np.pi)
+    noise = rng.normal(1, 0.05, (len(intervals), len(days)))
+    return pd.DataFrame((base_seconds * shape[:, None] * noise).round().astype(np.float32), index=intervals, columns=days)
+
+
+def build_charts(staffing_df, days, intervals):
+    """
+    Builds (without rendering) the app's heatmap and daily bar chart for one scenario
+    """
+    heatmap_data = staffing_df.pivot_table(index="Day", columns="Interval", values="positions", aggfunc="mean", observed=True)
+    heatmap_data = heatmap_data.reindex(days)
+    heatmap = go.Figure(data=go.Heatmap(z=heatmap_data.values, x=heatmap_data.columns, y=heatmap_data.index, colorscale='YlGnBu'))
+    daily_staffing = staffing_df[staffing_df["Day"] == days[0]]
+    bar = px.bar(daily_staffing, x="Interval", y="positions")
+    bar.update_xaxes(tickvals=[str(t) for t in intervals])
+    return heatmap, bar
+
+
+def warm_up_charts():
+    """
+    Builds a throwaway figure of each kind, so plotly's lazily loaded modules and default
+    template are in place before chart building is timed
+    """
+    go.Figure(data=go.Heatmap(z=[[0]]))
+    px.bar(pd.DataFrame({"x": [0], "y": [0]}), x="x", y="y")
+
+
+def run_sweep(calls_df, aht_df, scenarios, days, intervals, interval_minutes, workers):
+    """
+    Runs the app's sweep once and returns the seconds spent in each stage, the sweep's
+    metrics and the staffing tables. Each part runs once, as in the app: the daily totals of
+    every scenario, the Scenario Summary, and the Total Staffing table and charts of the
+    scenario that is opened.
+    """
+    planner = ScenarioPlanner(n_workers=workers)
+    metrics = SweepMetrics()
+    try:
+        started = time.perf_counter()
+        staffing_frames = calculate_staffing(calls_df, aht_df, scenarios, days, intervals, planner=planner,
+                                             interval_minutes=interval_minutes, metrics=metrics)
+
+        with metrics.stage("total_staffing"):
+            daily_totals = scenario_daily_totals(staffing_frames, days)
+        with metrics.stage("summary"):
+            summarize_scenarios(scenarios, staffing_frames, daily_totals, WORKING_HOURS, WORKING_DAYS, days, interval_minutes)
+        with metrics.stage("scenario tables"):
+            build_total_staffing(daily_totals[0], WORKING_HOURS, WORKING_DAYS, days, interval_minutes)
+
+        charts = None
+        if go is not None:
+            with metrics.stage("charts"):
+                build_charts(staffing_frames[0], days, intervals)
+            charts = metrics.seconds("charts")
+        end_to_end = time.perf_counter() - started
+    finally:
+        planner.shutdown()
+
+    timings = {
+        "solve": metrics.seconds("solve"),
+        "staffing_df": metrics.seconds("build jobs") + metrics.seconds("staffing_df"),
+        "total_staffing": metrics.seconds("total_staffing") + metrics.seconds("scenario tables"),
+        "summary": metrics.seconds("summary"),
+        "charts": charts,
+        "end_to_end": end_to_end,
+    }
+    return timings, metrics, staffing_frames
+
+
+def check_baseline(staffing_frames, scenarios, calls_df, interval_minutes, n_cells, rng):
+    """
+    Re-solves a random sample of cells one by one with pyworkforce's MultiErlangC and reports
+    how many disagree with the sweep
+    """
+    try:
+        from pyworkforce.queuing import MultiErlangC
+    except ImportError:
+        return {"available": False}
+
+    candidates = [(number, position) for number, staffing_df in enumerate(staffing_frames) for position in range(len(staffing_df))]
+    sample = rng.choice(len(candidates), size=min(n_cells, len(candidates)), replace=False)
+    mismatched_positions = 0
+    max_difference = {field: 0.0 for field in ["service_level", "occupancy", "waiting_probability"]}
+    started = time.perf_counter()
+    for index in sample:
+        number, position = candidates[index]
+        awt, shrinkage, max_occupancy, _, target = scenarios[number]
+        row = staffing_frames[number].iloc[position]
+        # float32 inputs would change pyworkforce's rounding; the stored AHT is a whole number of seconds
+        calls = float(calls_df.at[row["Interval"], row["Day"]])
+        aht = float(row["Average AHT"])
+        baseline = MultiErlangC(
+            param_grid={"transactions": [calls], "aht": [aht / 60], "interval": [interval_minutes],
+                        "asa": [awt / 60], "shrinkage": [shrinkage / 100]},
+            n_jobs=1,
+        ).required_positions({"service_level": [target / 100], "max_occupancy": [max_occupancy / 100]})[0]
+        if baseline["raw_positions"] != row["raw_positions"] or baseline["positions"] != row["positions"]:
+            mismatched_positions += 1
+        for field in max_difference:
+            max_difference[field] = max(max_difference[field], abs(float(baseline[field]) - float(row[field])))
+    baseline_seconds = time.perf_counter() - started
+
+    return {
+        "available": True,
+        "cells": len(sample),
+        "mismatched_positions": mismatched_positions,
+        # The sweep stores metrics as float32, so agreement is to about 1e-7
+        "max_abs_difference": max_difference,
+        "seconds_per_cell": baseline_seconds / len(sample) if len(sample) else None,
+    }
+
+
+def benchmark_size(name, repeat, workers, baseline_cells, seed):
+    weeks, interval_minutes, daily_calls, aht_seconds, grid = SIZES[name]
+    rng = np.random.default_rng(seed)
+    days, intervals = make_days(weeks), make_intervals(interval_minutes)
+    calls_df = synthetic_calls(days, intervals, daily_calls, rng)
+    aht_df = synthetic_aht(days, intervals, aht_seconds, rng) if aht_seconds else None
+    scenarios = build_scenarios(*grid)
+
+    runs = []
+    for _ in range(repeat):
+        timings, metrics, staffing_frames = run_sweep(calls_df, aht_df, scenarios, days, intervals, interval_minutes, workers)
+        runs.append(timings)
+    best = {stage: min((run[stage] for run in runs if run[stage] is not None), default=None) for stage in runs[0]}
+
+    cells = sum(len(staffing_df) for staffing_df in staffing_frames)
+    baseline = check_baseline(staffing_frames, scenarios, calls_df, interval_minutes, baseline_cells, rng)
+    if baseline.get("seconds_per_cell"):
+        baseline["estimated_sweep_seconds"] = baseline["seconds_per_cell"] * cells
+    return {
+        "size": name,
+        "weeks": weeks,
+        "interval_minutes": interval_minutes,
+        "daily_calls": daily_calls,
+        "aht_table": aht_df is not None,
+        "scenarios": len(scenarios),
+        "cells": cells,
+        "best_seconds": best,
+        "runs": runs,
+        "metrics": metrics.as_dict(),
+        "cells_per_second": cells / best["solve"] if best["solve"] else None,
+        "baseline": baseline,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the staffing sweep on synthetic forecasts.")
+    parser.add_argument("--sizes", default="small,medium", help=f"Comma-separated sizes out of {', '.join(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per size; the best time of each stage is reported")
+    parser.add_argument("--workers", type=int, default=1, help="Solver worker processes (default 1, for comparable timings)")
+    parser.add_argument("--baseline-cells", type=int, default=200, help="Cells re-solved with pyworkforce per size (0 skips)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic forecasts")
+    parser.add_argument("-o", "--output", default="bench_output.json", help="JSON file receiving the results")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        raise SystemExit(f"Unknown sizes: {', '.join(unknown)}")
+
+    if go is not None:
+        warm_up_charts()
+    results = {"environment": environment(), "benchmarks": []}
+    for size in sizes:
+        result = benchmark_size(size, max(1, args.repeat), args.workers, args.baseline_cells, args.seed)
+        results["benchmarks"].append(result)
+        best = result["best_seconds"]
+        stages = ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in best.items() if seconds is not None)
+        agreement = result["baseline"]
+        checked = (f"{agreement['mismatched_positions']}/{agreement['cells']} baseline mismatches"
+                   if agreement.get("cells") else "baseline not checked")
+        print(f"{size}: {result['cells']:,} cells, {stages}; {checked}", file=sys.stderr)
+
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
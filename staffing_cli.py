@@ -0,0 +1,266 @@
+"""
+Command-line batch runner for the staffing sweep.
+
+Reads a calls forecast (and optionally an AHT table) laid out like the app's editors, one
+column per day from Sunday to Saturday (per week of the horizon) and one row per interval, from
+CSV or Parquet. Each scenario's staffing rows are appended to a Parquet file as soon as they are
+solved.
+
+With --forecast, the input is instead a long-format multi-queue forecast with queue, site, date,
+interval, calls and (optionally) aht columns. The whole portfolio is solved in one batch and
+--totals receives per-queue and portfolio roll-ups.
+
+With --rosters, the run goes the other way: each roster file holds scheduled positions in the
+calls table's layout, and every roster is scored against the forecast under every scenario
+(achieved service level, ASA, occupancy and waiting probability per interval), with one
+summary row per roster and scenario in --totals.
+
+Example:
+
+    python staffing_cli.py calls.csv --aht-values 300,400 --awt 20,30 --shrinkage 30 \\
+        --max-occupancy 85 --service-level 80,90 --output staffing.parquet
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from perf_metrics import SweepMetrics, ThrottledProgress
+from scenario_planner import ScenarioPlanner
+from solution_cache import DEFAULT_CACHE_PATH, SolutionCache
+from staffing_engine import (INTERVAL_MINUTES, STAFFING_COLUMNS, STAFFING_DTYPES, build_scenarios, build_total_staffing,
+                             calculate_portfolio, daily_position_totals, evaluate_rosters, forecast_dates, iter_staffing,
+                             make_days, make_intervals, portfolio_totals, prepare_forecast, summarize_rosters)
+
+COLUMN_TYPES = {"Day": str, "Interval": str, **STAFFING_DTYPES}
+
+
+def parse_values(text):
+    # Same parsing as the app's comma-separated inputs: non-numeric entries are dropped
+    return [float(value) for value in text.split(',') if value.strip().replace('.', '', 1).isdigit()]
+
+
+def read_table(path, days, intervals):
+    if path.endswith((".parquet", ".pq")):
+        table = pd.read_parquet(path)
+    else:
+        table = pd.read_csv(path, index_col=0)
+    missing = [day for day in days if day not in table.columns]
+    if missing:
+        raise SystemExit(f"{path}: missing day columns {', '.join(missing)}")
+    if len(table) != len(intervals):
+        raise SystemExit(f"{path}: expected {len(intervals)} interval rows, found {len(table)}")
+    table = table[days].astype("float32")
+    if np.isinf(table.to_numpy()).any():
+        raise SystemExit(f"{path}: the table holds infinite values")
+    # Blank cells mean no calls, as in the app's editors
+    return table.fillna(0)
+
+
+def read_forecast(path, interval_minutes):
+    table = pd.read_parquet(path) if path.endswith((".parquet", ".pq")) else pd.read_csv(path)
+    try:
+        return prepare_forecast(table, interval_minutes)
+    except ValueError as error:
+        raise SystemExit(f"{path}: {error}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Size a weekly calls forecast over a grid of staffing scenarios.")
+    parser.add_argument("calls", help="CSV or Parquet calls table (intervals x Sunday..Saturday), or forecast with --forecast")
+    parser.add_argument("--forecast", action="store_true",
+                        help="Read calls as a long-format queue, site, date, interval, calls, aht forecast")
+    aht = parser.add_mutually_exclusive_group()
+    aht.add_argument("--aht-values", type=parse_values, help="Average handling times (seconds, comma-separated)")
+    aht.add_argument("--aht-table", help="CSV or Parquet AHT table with the same layout as the calls table")
+    parser.add_argument("--rosters", nargs="+", metavar="ROSTER",
+                        help="Score these staffing plans (scheduled positions, same layout as the calls table) instead of sizing")
+    parser.add_argument("--awt", type=parse_values, default="10,20,30", help="Acceptable waiting times (seconds, comma-separated)")
+    parser.add_argument("--shrinkage", type=parse_values, default="20,30,40", help="Shrinkage (%%, comma-separated)")
+    parser.add_argument("--max-occupancy", type=parse_values, default="70,80,90", help="Max occupancy (%%, comma-separated)")
+    parser.add_argument("--service-level", type=parse_values, default="80,85,90", help="Service level targets (%%, comma-separated)")
+    parser.add_argument("--working-hours", type=float, default=8.0, help="Working hours per day")
+    parser.add_argument("--working-days", type=float, default=5.0, help="Working days per week")
+    parser.add_argument("--interval-minutes", type=int, default=INTERVAL_MINUTES, help="Length of each table row (minutes)")
+    parser.add_argument("--weeks", type=int, default=1,
+                        help="Planning horizon; above 1 the tables have 'Week N Sunday'..'Week N Saturday' columns")
+    parser.add_argument("-o", "--output", required=True, help="Parquet file receiving the staffing rows of every scenario")
+    parser.add_argument("--totals", help="Optional Parquet file receiving the Total Staffing table of every scenario "
+                                         "(with --forecast, the per-queue roll-ups; portfolio roll-ups go to *_portfolio.parquet)")
+    parser.add_argument("--workers", type=int, default=None, help="Solver worker processes (default: all CPUs)")
+    parser.add_argument("--batch-size", type=int, default=32, help="Scenarios solved per batch")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="SQLite solution cache path")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the solution cache")
+    parser.add_argument("--metrics", help="Optional JSON file receiving stage timings and counters")
+    return parser
+
+
+def read_tables(args):
+    try:
+        days, intervals = make_days(args.weeks), make_intervals(args.interval_minutes)
+    except ValueError as error:
+        raise SystemExit(str(error))
+    calls_df = read_table(args.calls, days, intervals)
+    aht_df = read_table(args.aht_table, days, intervals) if args.aht_table else None
+    if aht_df is not None and not aht_df.index.equals(calls_df.index):
+        raise SystemExit("The AHT table must have the same intervals as the calls table")
+    return calls_df, aht_df, days
+
+
+def write_scenarios(args, calls_df, aht_df, days, scenarios, planner, metrics):
+    """
+    Solves the calls table scenario batch by scenario batch, appending each scenario's rows
+    to the output as soon as they are ready
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    intervals = list(calls_df.index)  # Label rows as the input does
+    report = ThrottledProgress(
+        lambda fraction: print(f"\r{round(fraction * len(scenarios))}/{len(scenarios)} scenarios", end="", file=sys.stderr))
+    totals = []
+    writer = None
+    try:
+        for number, (scenario, staffing_df) in enumerate(
+                iter_staffing(calls_df, aht_df, scenarios, days, intervals, planner=planner, batch_size=args.batch_size,
+                              interval_minutes=args.interval_minutes, metrics=metrics), start=1):
+            awt, shrinkage, max_occupancy, avg_aht, target = scenario
+            with metrics.stage("write"):
+                rows = staffing_df.reset_index(drop=True).astype(COLUMN_TYPES)[STAFFING_COLUMNS]
+                if writer is None:
+                    table = pa.Table.from_pandas(rows, preserve_index=False)
+                    writer = pq.ParquetWriter(args.output, table.schema)
+                else:
+                    table = pa.Table.from_pandas(rows, schema=writer.schema, preserve_index=False)
+                writer.write_table(table)
+
+            if args.totals:
+                with metrics.stage("total_staffing"):
+                    total_staffing = build_total_staffing(daily_position_totals(staffing_df), args.working_hours,
+                                                          args.working_days, days, args.interval_minutes)
+                    total_staffing = total_staffing.reset_index(names="Day")
+                    total_staffing.insert(1, "AWT", awt)
+                    total_staffing.insert(2, "Shrinkage", shrinkage)
+                    total_staffing.insert(3, "Max Occupancy", max_occupancy)
+                    total_staffing.insert(4, "Average AHT", float("nan") if avg_aht is None else avg_aht)
+                    total_staffing.insert(5, "Service Level Target", target)
+                    totals.append(total_staffing)
+
+            report(number / len(scenarios))
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if totals:
+        pd.concat(totals, ignore_index=True).to_parquet(args.totals, index=False)
+    return f"Wrote {len(scenarios)} scenarios to {args.output}"
+
+
+def write_portfolio(args, forecast, scenarios, planner, metrics):
+    """
+    Solves every queue of a long-format forecast in one batch and writes its rows (one row
+    group per scenario) and per-queue and portfolio roll-ups
+    """
+    try:
+        staffing = calculate_portfolio(forecast, scenarios, planner=planner, interval_minutes=args.interval_minutes, metrics=metrics,
+                                       progress=ThrottledProgress(lambda fraction: print(f"\r{fraction:.0%} solved", end="", file=sys.stderr)))
+    except ValueError as error:
+        raise SystemExit(f"{args.calls}: {error}")
+    with metrics.stage("write"):
+        staffing.to_parquet(args.output, index=False, row_group_size=max(1, -(-len(staffing) // len(scenarios))))
+
+    if args.totals:
+        with metrics.stage("total_staffing"):
+            queue_totals, totals = portfolio_totals(staffing, scenarios, forecast_dates(forecast), args.working_hours,
+                                                    args.working_days, args.interval_minutes)
+        queue_totals.to_parquet(args.totals, index=False)
+        stem = args.totals[:-len(".parquet")] if args.totals.endswith(".parquet") else args.totals
+        totals.to_parquet(f"{stem}_portfolio.parquet", index=False)
+    return f"Wrote {len(staffing):,} staffing rows of {forecast['queue'].nunique()} queues to {args.output}"
+
+
+def write_rosters(args, calls_df, aht_df, days, scenarios, metrics):
+    """
+    Scores every roster file under every scenario in one batch and writes the per-interval
+    results and the per-roster summary
+    """
+    intervals = list(calls_df.index)
+    rosters = {}
+    for path in args.rosters:
+        roster = read_table(path, days, intervals)
+        if not roster.index.equals(calls_df.index):
+            raise SystemExit(f"{path}: the roster must have the same intervals as the calls table")
+        rosters[os.path.splitext(os.path.basename(path))[0]] = roster
+    if len(rosters) != len(args.rosters):
+        raise SystemExit("Roster file names must be unique, they name the rosters in the output")
+
+    try:
+        evaluation = evaluate_rosters(calls_df, aht_df, rosters, scenarios, days, intervals,
+                                      interval_minutes=args.interval_minutes, metrics=metrics)
+    except ValueError as error:
+        raise SystemExit(str(error))
+    with metrics.stage("write"):
+        evaluation.astype({"Roster": str, "Day": str, "Interval": str}).to_parquet(args.output, index=False)
+
+    if args.totals:
+        with metrics.stage("total_staffing"):
+            summarize_rosters(evaluation, scenarios).astype({"Roster": str}).to_parquet(args.totals, index=False)
+    return f"Scored {len(rosters)} rosters under {len(scenarios)} scenarios ({len(evaluation):,} rows) to {args.output}"
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.forecast and args.aht_table:
+        raise SystemExit("--aht-table does not apply to --forecast, whose AHT comes from its aht column")
+    if args.forecast and args.rosters:
+        raise SystemExit("--rosters scores calls tables, not --forecast portfolios")
+    if not args.forecast and args.aht_values is None and args.aht_table is None:
+        raise SystemExit("One of --aht-values or --aht-table is required")
+
+    scenarios = build_scenarios(args.awt, args.shrinkage, args.max_occupancy, args.aht_values, args.service_level)
+    if not scenarios:
+        raise SystemExit("The scenario grid is empty")
+
+    if args.forecast:
+        forecast = read_forecast(args.calls, args.interval_minutes)
+    else:
+        calls_df, aht_df, days = read_tables(args)
+
+    metrics = SweepMetrics()
+    started = time.perf_counter()
+    if args.rosters:
+        # Scoring evaluates fixed positions directly, with no search to dispatch or cache
+        summary = write_rosters(args, calls_df, aht_df, days, scenarios, metrics)
+        report_run(args, summary, started, metrics)
+        return
+
+    cache = None if args.no_cache else SolutionCache(args.cache)
+    planner = ScenarioPlanner(n_workers=args.workers, cache=cache)
+
+    try:
+        if args.forecast:
+            summary = write_portfolio(args, forecast, scenarios, planner, metrics)
+        else:
+            summary = write_scenarios(args, calls_df, aht_df, days, scenarios, planner, metrics)
+    finally:
+        planner.shutdown()
+
+    report_run(args, summary, started, metrics)
+    if cache is not None:
+        print(f"Solution cache hit rate: {cache.hit_rate:.0%}", file=sys.stderr)
+
+
+def report_run(args, summary, started, metrics):
+    elapsed = time.perf_counter() - started
+    print(f"\n{summary} in {elapsed:.1f}s", file=sys.stderr)
+    if args.metrics:
+        with open(args.metrics, "w") as output:
+            json.dump({"elapsed_seconds": elapsed, **metrics.as_dict()}, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,575 @@
+"""
+Headless staffing sweep.
+
+Everything needed to size a calls/AHT forecast over a scenario grid, without Streamlit or
+Plotly, so the same code backs the app, batch jobs and the command line (staffing_cli.py).
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+
+import erlang_engine
+from perf_metrics import SweepMetrics
+
+DAYS = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+INTERVAL_MINUTES = 30
+INTERVALS = pd.date_range("00:00", "23:30", freq="30min").time
+
+STAFFING_COLUMNS = [
+    "Day", "Interval", "AWT", "Shrinkage", "Max Occupancy",
+    "Average AHT", "Service Level Target", "raw_positions", "positions",
+    "service_level", "occupancy", "waiting_probability"
+]
+
+# Compact result layout: Day and Interval are categoricals over the planning grid, metrics are
+# 32-bit, so a quarter of 5-minute intervals across dozens of scenarios stays in memory
+STAFFING_DTYPES = {
+    "AWT": np.float32, "Shrinkage": np.float32, "Max Occupancy": np.float32,
+    "Average AHT": np.float32, "Service Level Target": np.float32,
+    "raw_positions": np.int32, "positions": np.int32,
+    "service_level": np.float32, "occupancy": np.float32, "waiting_probability": np.float32,
+}
+
+
+def make_intervals(interval_minutes=INTERVAL_MINUTES):
+    """
+    Returns the start times of the intervals of one day, interval_minutes apart
+    """
+    if interval_minutes <= 0 or (24 * 60) % interval_minutes:
+        raise ValueError("interval_minutes must divide a day (1440 minutes)")
+    return pd.date_range("00:00", periods=(24 * 60) // interval_minutes, freq=f"{interval_minutes}min").time
+
+
+def make_days(weeks=1):
+    """
+    Returns the day columns of a planning horizon: Sunday..Saturday for a single week,
+    "Week 1 Sunday".."Week N Saturday" for longer horizons
+    """
+    if weeks < 1:
+        raise ValueError("weeks must be at least 1")
+    if weeks == 1:
+        return list(DAYS)
+    return [f"Week {week} {day}" for week in range(1, weeks + 1) for day in DAYS]
+
+
+def empty_table(days, intervals):
+    """
+    Returns a zero-filled input table (intervals x days) in the editors' layout
+    """
+    return pd.DataFrame(np.zeros((len(intervals), len(days)), dtype=np.float32), index=intervals, columns=days)
+
+
+def build_scenarios(acceptable_waiting_times, shrinkages, max_occupancies, average_handling_times, service_level_targets):
+    """
+    Returns the cartesian scenario grid as (awt, shrinkage, max_occupancy, avg_aht, target) tuples.
+    Pass average_handling_times=None when the AHT comes from an interval table.
+    """
+    scenario_ahts = [None] if average_handling_times is None else average_handling_times
+    return list(itertools.product(acceptable_waiting_times, shrinkages, max_occupancies, scenario_ahts, service_level_targets))
+
+
+def scenario_label(scenario):
+    awt, shrinkage, max_occupancy, avg_aht, target = scenario
+    aht_label = "AHT table" if avg_aht is None else f"{avg_aht}s"
+    return f"AWT: {awt}s, Shrinkage: {shrinkage}%, Max Occupancy: {max_occupancy}%, Average AHT: {aht_label}, Service Level Target: {target}%"
+
+
+def flatten_cells(df, days):
+    # Day-major flattening: every interval of the first day, then the next day, and so on.
+    # Blank cells (NaN, e.g. cleared in the editor) count as 0 and are skipped like empty intervals
+    values = df[days].to_numpy(dtype=float).T.ravel()
+    return np.where(np.isnan(values), 0.0, values)
+
+
+def calculate_staffing(calls_df, aht_df, scenarios, days, intervals, planner=None, progress=None, stats=None, cells=None,
+                       interval_minutes=INTERVAL_MINUTES, metrics=None):
+    """
+    Solves every (scenario, interval) cell in one batch with the vectorized Erlang C engine.
+
+    scenarios is a list of (awt, shrinkage, max_occupancy, avg_aht, target) tuples in the app's
+    units (seconds and percentages); avg_aht is None when the AHT comes from aht_df.
+    The batch is dispatched through planner when given (filling stats with its solve counts),
+    otherwise solved inline. cells optionally restricts the solve to a day-major boolean mask.
+    interval_minutes is the length of each row of the tables. metrics (a SweepMetrics) receives
+    the time spent building jobs, solving and building the tables, and the rows produced.
+    Returns one staffing DataFrame per scenario, in the same order, indexed by cell position.
+    """
+    metrics = metrics if metrics is not None else SweepMetrics()
+    with metrics.stage("build jobs"):
+        calls, cell_index, scenario_cells, columns = _scenario_cells(calls_df, aht_df, scenarios, days, cells)
+    solution = _solve(calls[cell_index], columns, interval_minutes, planner, progress, stats, metrics,
+                      [len(keep) for keep in scenario_cells])
+
+    with metrics.stage("staffing_df"):
+        staffing_frames = _staffing_frames(scenario_cells, columns, solution, days, intervals)
+    metrics.count("rows", len(cell_index))
+    return staffing_frames
+
+
+def _scenario_cells(calls_df, aht_df, scenarios, days, cells):
+    """
+    Expands the scenario grid over the table cells with calls (and AHT), returning the flat
+    calls, the cell of every job, each scenario's cells and the per-job scenario columns
+    """
+    calls = flatten_cells(calls_df, days)
+    table_aht = flatten_cells(aht_df, days) if aht_df is not None else None
+
+    scenario_cells, columns = [], {"AWT": [], "Shrinkage": [], "Max Occupancy": [], "Average AHT": [], "Service Level Target": []}
+    for awt, shrinkage, max_occupancy, avg_aht, target in scenarios:
+        if avg_aht is None:
+            aht = table_aht
+            keep = np.flatnonzero((calls != 0) & (aht != 0))  # Skip intervals with no calls or no AHT
+        else:
+            aht = np.full_like(calls, avg_aht)
+            keep = np.flatnonzero(calls != 0)  # Skip intervals with no calls
+        if cells is not None:
+            keep = keep[cells[keep]]
+        scenario_cells.append(keep)
+        columns["AWT"].append(np.full(len(keep), awt))
+        columns["Shrinkage"].append(np.full(len(keep), shrinkage))
+        columns["Max Occupancy"].append(np.full(len(keep), max_occupancy))
+        columns["Average AHT"].append(aht[keep])
+        columns["Service Level Target"].append(np.full(len(keep), target))
+
+    cell_index = np.concatenate(scenario_cells) if scenario_cells else np.array([], dtype=int)
+    columns = {name: np.concatenate(values) if values else np.array([]) for name, values in columns.items()}
+    return calls, cell_index, scenario_cells, columns
+
+
+def _solve(transactions, columns, interval_minutes, planner, progress, stats, metrics, groups):
+    """
+    Converts the app's units (seconds, percentages) to the engine's and solves every job,
+    through the planner when given, which caches each group (a scenario's jobs) as one entry
+    """
+    if not len(transactions):
+        return {}
+    jobs = {
+        "transactions": transactions,
+        "aht": columns["Average AHT"] / 60,
+        "asa": columns["AWT"] / 60,
+        "shrinkage": columns["Shrinkage"] / 100,
+        "service_level": columns["Service Level Target"] / 100,
+        "max_occupancy": columns["Max Occupancy"] / 100,
+        "interval": interval_minutes,
+    }
+    with metrics.stage("solve"):
+        if planner is not None:
+            return planner.solve(jobs, progress=progress, stats=stats, metrics=metrics, groups=groups)
+        with metrics.stage("erlang solve"):
+            solution = erlang_engine.required_positions(**jobs)
+        metrics.count("cells", len(transactions))
+        metrics.count("solved", len(transactions))
+        return solution
+
+
+def _staffing_frames(scenario_cells, columns, solution, days, intervals):
+    day_codes = np.repeat(np.arange(len(days), dtype=np.int32), len(intervals))
+    interval_codes = np.tile(np.arange(len(intervals), dtype=np.int32), len(days))
+    day_categories = pd.Index(days)
+    interval_categories = pd.Index(intervals)
+
+    staffing_frames = []
+    offset = 0
+    for keep in scenario_cells:
+        rows = slice(offset, offset + len(keep))
+        offset += len(keep)
+        data = {"Day": pd.Categorical.from_codes(day_codes[keep], categories=day_categories),
+                "Interval": pd.Categorical.from_codes(interval_codes[keep], categories=interval_categories)}
+        data.update({name: values[rows] for name, values in columns.items()})
+        for name in ["raw_positions", "positions", "service_level", "occupancy", "waiting_probability"]:
+            data[name] = solution[name][rows] if solution else np.array([])
+        for name, dtype in STAFFING_DTYPES.items():
+            data[name] = data[name].astype(dtype, copy=False)
+        staffing_frames.append(pd.DataFrame(data, index=pd.Index(keep, name="cell"), columns=STAFFING_COLUMNS))
+
+    return staffing_frames
+
+
+def changed_cells(snapshot, calls_df, aht_df, days):
+    """
+    Returns the day-major boolean mask of cells whose calls or AHT differ from the snapshot
+    """
+    changed = flatten_cells(calls_df, days) != snapshot["calls"]
+    if aht_df is not None:
+        changed |= flatten_cells(aht_df, days) != snapshot["aht"]
+    return changed
+
+
+def daily_position_totals(staffing_df):
+    """
+    Returns the per-day sums of raw and scheduled positions of a staffing table
+    """
+    return staffing_df.groupby("Day", observed=True)[["raw_positions", "positions"]].sum().astype(np.int64)
+
+
+def scenario_daily_totals(staffing_frames, days):
+    """
+    Returns the daily_position_totals of every scenario's staffing table, summed for all of
+    them in one pass instead of one groupby per scenario
+    """
+    sizes = [len(staffing_df) for staffing_df in staffing_frames]
+    if not sum(sizes):
+        return [daily_position_totals(staffing_df) for staffing_df in staffing_frames]
+    scenario_days = (np.repeat(np.arange(len(staffing_frames)), sizes) * len(days)
+                     + np.concatenate([staffing_df["Day"].cat.codes.to_numpy() for staffing_df in staffing_frames]))
+    rows = np.bincount(scenario_days, minlength=len(staffing_frames) * len(days)).reshape(-1, len(days))
+    columns = pd.Index(["raw_positions", "positions"])
+    sums = np.stack([np.bincount(scenario_days, weights=np.concatenate([staffing_df[name].to_numpy() for staffing_df in staffing_frames]),
+                                 minlength=rows.size).reshape(rows.shape) for name in columns], axis=-1).astype(np.int64)
+
+    # Like the groupby, only days with rows are kept, in the planning grid's order
+    day_categories = pd.CategoricalDtype(pd.Index(days))
+    daily_totals = []
+    for number in range(len(staffing_frames)):
+        observed = np.flatnonzero(rows[number])
+        index = pd.CategoricalIndex(pd.Categorical.from_codes(observed, dtype=day_categories), name="Day")
+        daily_totals.append(pd.DataFrame(sums[number, observed], index=index, columns=columns))
+    return daily_totals
+
+
+def patch_staffing(staffing_df, daily_totals, update_df, changed):
+    """
+    Replaces the changed cells of a scenario's staffing table with freshly solved rows and
+    adjusts its per-day position sums by the difference. Days left without rows are dropped,
+    as daily_position_totals of the patched table would not have them either.
+    """
+    removed = staffing_df[changed[staffing_df.index]]
+    staffing_df = pd.concat([staffing_df.drop(removed.index), update_df]).sort_index()
+    daily_totals = (daily_totals
+                    .add(daily_position_totals(update_df), fill_value=0)
+                    .sub(daily_position_totals(removed), fill_value=0)
+                    .astype(np.int64))
+    return staffing_df, daily_totals[daily_totals.index.isin(staffing_df["Day"].unique())]
+
+
+def build_total_staffing(daily_totals, working_hours, working_days, days, interval_minutes=INTERVAL_MINUTES, by=None):
+    """
+    Rolls per-day position sums up to FTE: positions summed over the day's intervals become
+    position hours, then daily heads, then the weekly total (averaged over the weeks of the
+    horizon) divided by working days.
+
+    With by, daily_totals holds the days of many groups (e.g. queues) and those columns; the
+    maximum and weekly total are then taken within each group and the rows keep their order.
+    """
+    total_staffing = daily_totals[(by or []) + ["raw_positions", "positions"]].copy()
+    total_staffing["Sum of Raw Positions"] = total_staffing["raw_positions"]
+    total_staffing["Sum of Positions"] = total_staffing["positions"]
+    total_staffing["Position Hours"] = total_staffing["Sum of Positions"] * interval_minutes / 60
+    total_staffing["Divided by Working Hours"] = total_staffing["Position Hours"] / working_hours
+    weeks = len(days) / len(DAYS)
+    if by is None:
+        total_staffing["Maximum Value"] = total_staffing["Divided by Working Hours"].max()
+        total_staffing["Sum of the Week"] = total_staffing["Divided by Working Hours"].sum() / weeks
+    else:
+        groups = total_staffing.groupby(by, observed=True)["Divided by Working Hours"]
+        total_staffing["Maximum Value"] = groups.transform("max")
+        total_staffing["Sum of the Week"] = groups.transform("sum") / weeks
+    total_staffing["Divided by Working Days"] = total_staffing["Sum of the Week"] / working_days
+
+    if by is not None:
+        return total_staffing
+    # Ensure the table is sorted from Sunday to Saturday
+    return total_staffing.reindex(days)
+
+
+def summarize_scenarios(scenarios, staffing_frames, daily_totals, working_hours, working_days, days, interval_minutes=INTERVAL_MINUTES):
+    """
+    Returns one row per scenario with its weekly roll-ups, peak requirement and average
+    achieved service level and occupancy. The daily totals of every scenario are rolled up
+    in one grouped build_total_staffing call.
+    """
+    summary = _scenario_parameters(scenarios).reset_index(drop=True)
+    daily = pd.concat(daily_totals, keys=range(len(daily_totals)), names=["Scenario"]).reset_index()
+    total_staffing = build_total_staffing(daily, working_hours, working_days, days, interval_minutes, by=["Scenario"])
+    # Scenarios without a single interval to staff keep no daily rows: no positions, no FTE
+    totals = total_staffing.groupby("Scenario").agg(ROLLUP_AGGREGATIONS).reindex(summary.index)
+    for name in ["Sum of Raw Positions", "Sum of Positions"]:
+        summary[name] = totals[name].fillna(0).astype(np.int64)
+    summary["Peak Positions"] = [staffing_df["positions"].max() if len(staffing_df) else 0 for staffing_df in staffing_frames]
+    for name in ["Maximum Value", "Sum of the Week", "Divided by Working Days"]:
+        summary[name] = totals[name]
+    summary["Mean Service Level"] = [staffing_df["service_level"].mean() for staffing_df in staffing_frames]
+    summary["Mean Occupancy"] = [staffing_df["occupancy"].mean() for staffing_df in staffing_frames]
+    return summary
+
+
+def iter_staffing(calls_df, aht_df, scenarios, days=DAYS, intervals=INTERVALS, planner=None, batch_size=32, progress=None,
+                  interval_minutes=INTERVAL_MINUTES, metrics=None):
+    """
+    Yields (scenario, staffing_df) for every scenario, solving batch_size scenarios at a time
+    so memory stays flat however large the grid is. progress is called with the fraction of
+    scenarios done after each batch.
+    """
+    for start in range(0, len(scenarios), batch_size):
+        batch = scenarios[start:start + batch_size]
+        for scenario, staffing_df in zip(batch, calculate_staffing(calls_df, aht_df, batch, days, intervals, planner=planner,
+                                                                           interval_minutes=interval_minutes, metrics=metrics)):
+            yield scenario, staffing_df
+        if progress is not None:
+            progress(min(start + batch_size, len(scenarios)) / len(scenarios))
+
+
+# Multi-queue portfolios: a long-format forecast with one row per (queue, site, date, interval)
+
+FORECAST_COLUMNS = ["queue", "site", "date", "interval", "calls", "aht"]
+PORTFOLIO_KEYS = ["Scenario", "queue", "site"]
+SCENARIO_COLUMNS = ["AWT", "Shrinkage", "Max Occupancy", "Average AHT", "Service Level Target"]
+# Daily sums add up over the horizon; the rest repeat the same group-level value on every day
+ROLLUP_AGGREGATIONS = {"Sum of Raw Positions": "sum", "Sum of Positions": "sum", "Maximum Value": "first",
+                       "Sum of the Week": "first", "Divided by Working Days": "first"}
+
+
+def _scenario_parameters(scenarios):
+    """
+    Returns the scenario tuples as a table of SCENARIO_COLUMNS indexed by scenario position,
+    with NaN AHT where it comes from a table
+    """
+    return pd.DataFrame([[awt, shrinkage, max_occupancy, np.nan if avg_aht is None else avg_aht, target]
+                         for awt, shrinkage, max_occupancy, avg_aht, target in scenarios],
+                        columns=SCENARIO_COLUMNS, dtype=float).rename_axis("Scenario")
+
+
+def prepare_forecast(forecast, interval_minutes=None):
+    """
+    Validates a long-format forecast (FORECAST_COLUMNS, aht in seconds and optional when every
+    scenario sets its own AHT) and returns it with categorical queue, site and interval, dates
+    without time and float32 calls and AHT. Missing calls and AHT values are treated as 0; a
+    forecast without an aht column is returned without one.
+    With interval_minutes, the forecast's intervals must be a whole number of interval lengths
+    apart, since the same value sets the load and the roll-ups' position hours.
+    """
+    forecast = forecast.rename(columns=str.lower)
+    missing = [column for column in FORECAST_COLUMNS[:5] if column not in forecast.columns]
+    if missing:
+        raise ValueError(f"The forecast is missing the columns: {', '.join(missing)}")
+
+    prepared = pd.DataFrame({
+        "queue": forecast["queue"].astype(str).astype("category"),
+        "site": forecast["site"].astype(str).astype("category"),
+        "date": pd.to_datetime(forecast["date"]).dt.normalize(),
+        "interval": forecast["interval"].astype(str).astype("category"),
+        "calls": pd.to_numeric(forecast["calls"]).fillna(0).astype(np.float32),
+    }).reset_index(drop=True)
+    if "aht" in forecast.columns:
+        prepared["aht"] = pd.to_numeric(forecast["aht"]).fillna(0).astype(np.float32).to_numpy()
+    for column in ["calls", "aht"]:
+        if column in prepared.columns and not np.all(np.isfinite(prepared[column]) & (prepared[column] >= 0)):
+            raise ValueError(f"The forecast's {column} values must be finite and can't be negative")
+
+    duplicated = prepared.duplicated(["queue", "site", "date", "interval"])
+    if duplicated.any():
+        row = prepared[duplicated].iloc[0]
+        raise ValueError(f"The forecast repeats {row['queue']} / {row['site']} on {row['date']:%Y-%m-%d} {row['interval']}")
+
+    # Intervals with no calls may be left out, so the gaps only have to be multiples of the length
+    spacing = forecast_interval_minutes(prepared)
+    if interval_minutes is not None and spacing is not None and spacing % interval_minutes:
+        raise ValueError(f"The forecast's intervals are {spacing} minutes apart, which is not a multiple of the "
+                         f"interval length ({interval_minutes} minutes)")
+    return prepared
+
+
+def forecast_interval_minutes(forecast):
+    """
+    Returns the spacing of a prepared forecast's intervals, the greatest common divisor of the
+    gaps between its interval start times (None when it has a single interval). Intervals left
+    out of the file make it a multiple of the actual interval length.
+    """
+    labels = forecast["interval"].cat.categories
+    try:
+        starts = pd.to_datetime(pd.Index(labels, dtype=str), format="mixed")
+    except ValueError:
+        raise ValueError("The forecast's interval column must hold start times such as 08:30")
+    minutes = np.unique(starts.hour * 60 + starts.minute)
+    if len(minutes) < 2:
+        return None
+    return int(np.gcd.reduce(np.diff(minutes)))
+
+
+def forecast_dates(forecast):
+    """
+    Returns every date of the forecast's horizon, the days its weekly roll-ups average over
+    """
+    return list(pd.date_range(forecast["date"].min(), forecast["date"].max(), freq="D"))
+
+
+def calculate_portfolio(forecast, scenarios, planner=None, progress=None, stats=None,
+                        interval_minutes=INTERVAL_MINUTES, metrics=None):
+    """
+    Solves every (scenario, queue, site, date, interval) cell of a prepared forecast in one batch.
+
+    scenarios are the same tuples as for calculate_staffing; avg_aht None takes the forecast's
+    aht column, a ValueError when the forecast has none. Returns one long staffing DataFrame with a Scenario column holding the position
+    of each row's scenario, in the compact STAFFING_DTYPES layout.
+    """
+    metrics = metrics if metrics is not None else SweepMetrics()
+    with metrics.stage("build jobs"):
+        rows, scenario_index, columns = _portfolio_cells(forecast, scenarios)
+    solution = _solve(forecast["calls"].to_numpy(dtype=float)[rows], columns, interval_minutes, planner, progress,
+                      stats, metrics, np.bincount(scenario_index, minlength=len(scenarios)).tolist())
+
+    with metrics.stage("staffing_df"):
+        data = {"Scenario": scenario_index}
+        data.update({column: forecast[column].array.take(rows) for column in ["queue", "site", "date", "interval"]})
+        data.update(columns)
+        for name in ["raw_positions", "positions", "service_level", "occupancy", "waiting_probability"]:
+            data[name] = solution[name] if solution else np.array([])
+        for name, dtype in STAFFING_DTYPES.items():
+            data[name] = data[name].astype(dtype, copy=False)
+        staffing = pd.DataFrame(data)
+    metrics.count("rows", len(staffing))
+    return staffing
+
+
+def _portfolio_cells(forecast, scenarios):
+    calls = forecast["calls"].to_numpy(dtype=float)
+    if "aht" in forecast.columns:
+        table_aht = forecast["aht"].to_numpy(dtype=float)
+    elif any(avg_aht is None for _, _, _, avg_aht, _ in scenarios):
+        raise ValueError("The forecast has no aht column, so every scenario needs an average AHT")
+
+    scenario_rows, aht_values = [], []
+    for awt, shrinkage, max_occupancy, avg_aht, target in scenarios:
+        if avg_aht is None:
+            keep = np.flatnonzero((calls != 0) & (table_aht != 0))  # Skip intervals with no calls or no AHT
+            aht_values.append(table_aht[keep])
+        else:
+            keep = np.flatnonzero(calls != 0)  # Skip intervals with no calls
+            aht_values.append(np.full(len(keep), avg_aht))
+        scenario_rows.append(keep)
+
+    counts = [len(keep) for keep in scenario_rows]
+    rows = np.concatenate(scenario_rows) if scenario_rows else np.array([], dtype=int)
+    scenario_index = np.repeat(np.arange(len(scenarios), dtype=np.int32), counts)
+    parameters = _scenario_parameters(scenarios).to_numpy()
+    columns = {name: parameters[scenario_index, position] for position, name in enumerate(SCENARIO_COLUMNS)}
+    columns["Average AHT"] = np.concatenate(aht_values) if aht_values else np.array([])
+    return rows, scenario_index, columns
+
+
+def portfolio_totals(staffing, scenarios, dates, working_hours, working_days, interval_minutes=INTERVAL_MINUTES):
+    """
+    Rolls a portfolio staffing table up with the build_total_staffing formulas.
+
+    Returns (queue_totals, portfolio_totals): one row per (scenario, queue, site) with the
+    figures the Total Staffing table repeats on every day, and one row per scenario for the
+    whole portfolio, whose positions are summed across queues before the roll-up. Weekly totals
+    and FTE are additive, so the portfolio's equal the sum of its queues'.
+    """
+    scenario_parameters = _scenario_parameters(scenarios)
+
+    def rollup(keys):
+        daily_totals = (staffing.groupby(keys + ["date"], observed=True)[["raw_positions", "positions"]].sum()
+                        .astype(np.int64).reset_index())
+        total_staffing = build_total_staffing(daily_totals, working_hours, working_days, dates, interval_minutes, by=keys)
+        totals = total_staffing.groupby(keys, observed=True).agg(ROLLUP_AGGREGATIONS)
+        return scenario_parameters.join(totals.reset_index().set_index("Scenario"), how="right").reset_index()
+
+    return rollup(PORTFOLIO_KEYS), rollup(["Scenario"])
+
+
+# Reverse what-if: score staffing plans (scheduled positions per interval) against a forecast
+
+ROSTER_COLUMNS = ["Roster", "Scenario", "Day", "Interval", *SCENARIO_COLUMNS, "calls", "positions", "productive_positions",
+                  "service_level", "asa", "occupancy", "waiting_probability", "meets_target", "within_max_occupancy"]
+ROSTER_DTYPES = {
+    "Scenario": np.int32, **{name: STAFFING_DTYPES[name] for name in SCENARIO_COLUMNS}, "calls": np.float32,
+    "positions": np.int32, "productive_positions": np.int32,
+    "service_level": np.float32, "asa": np.float32, "occupancy": np.float32, "waiting_probability": np.float32,
+}
+
+
+def evaluate_rosters(calls_df, aht_df, rosters, scenarios, days, intervals, interval_minutes=INTERVAL_MINUTES, metrics=None):
+    """
+    Scores staffing plans against a forecast: the reverse of calculate_staffing.
+
+    rosters maps a name to a table of scheduled positions in the calls_df layout (intervals x
+    days, blanks count as nobody scheduled). Every (roster, scenario, interval) cell is evaluated
+    in one array computation; each interval's productive positions are its scheduled positions
+    after the scenario's shrinkage, rounded down. scenarios and the skipped intervals are the
+    same as for calculate_staffing.
+    Returns one long DataFrame (ROSTER_COLUMNS) with the achieved service level, ASA (seconds),
+    occupancy and waiting probability of every cell, and whether it meets the scenario's
+    service level target and maximum occupancy.
+    """
+    metrics = metrics if metrics is not None else SweepMetrics()
+    names = list(rosters)
+    with metrics.stage("build jobs"):
+        calls, cell_index, scenario_cells, columns = _scenario_cells(calls_df, aht_df, scenarios, days, None)
+        plans = np.stack([flatten_cells(rosters[name], days) for name in names]) if names else np.empty((0, len(calls)))
+        roster_index = np.repeat(np.arange(len(names), dtype=np.int32), len(cell_index))
+        scenario_index = np.tile(np.repeat(np.arange(len(scenarios), dtype=np.int32), [len(keep) for keep in scenario_cells]), len(names))
+        cells = np.tile(cell_index, len(names))
+        columns = {name: np.tile(values, len(names)) for name, values in columns.items()}
+        positions = plans[:, cell_index].ravel()
+
+    with metrics.stage("erlang evaluate"):
+        evaluation = erlang_engine.achieved_service(
+            transactions=calls[cells], aht=columns["Average AHT"] / 60, asa=columns["AWT"] / 60, positions=positions,
+            shrinkage=columns["Shrinkage"] / 100, interval=interval_minutes)
+    metrics.count("cells", len(cells))
+
+    with metrics.stage("staffing_df"):
+        data = {"Roster": pd.Categorical.from_codes(roster_index, categories=pd.Index(names)),
+                "Scenario": scenario_index,
+                "Day": pd.Categorical.from_codes(cells // len(intervals), categories=pd.Index(days)),
+                "Interval": pd.Categorical.from_codes(cells % len(intervals), categories=pd.Index(intervals))}
+        data.update(columns)
+        data["calls"] = calls[cells]
+        data["positions"] = positions
+        data.update(evaluation)
+        data["asa"] = evaluation["asa"] * 60
+        # Compared before the float32 cast so a plan sized exactly at the target counts as meeting it
+        data["meets_target"] = evaluation["service_level"] >= columns["Service Level Target"] / 100
+        data["within_max_occupancy"] = evaluation["occupancy"] <= columns["Max Occupancy"] / 100
+        for name, dtype in ROSTER_DTYPES.items():
+            data[name] = data[name].astype(dtype, copy=False)
+        evaluation = pd.DataFrame(data, columns=ROSTER_COLUMNS)
+    metrics.count("rows", len(evaluation))
+    return evaluation
+
+
+def summarize_rosters(evaluation, scenarios):
+    """
+    Returns one row per (roster, scenario) of an evaluate_rosters table: the service level
+    weighted by calls, the ASA weighted by calls over the intervals that keep up with their load
+    (the others, whose ASA is infinite, are counted in Understaffed Intervals), the occupancy
+    weighted by productive positions, the share of intervals meeting the target and the
+    scheduled positions summed over the evaluated intervals
+    """
+    scenario_parameters = _scenario_parameters(scenarios)
+
+    calls = evaluation["calls"].to_numpy(dtype=float)
+    productive = evaluation["productive_positions"].to_numpy(dtype=float)
+    speed_of_answer = evaluation["asa"].to_numpy(dtype=float)
+    understaffed = np.isinf(speed_of_answer)
+    answered_calls = np.where(understaffed, 0.0, calls)
+    weighted = pd.DataFrame({
+        "Roster": evaluation["Roster"],
+        "Scenario": evaluation["Scenario"],
+        "Intervals": 1,
+        "calls": calls,
+        "productive_positions": productive,
+        "service_level": evaluation["service_level"].to_numpy(dtype=float) * calls,
+        "answered_calls": answered_calls,
+        "asa": np.where(understaffed, 0.0, speed_of_answer) * answered_calls,
+        "occupancy": evaluation["occupancy"].to_numpy(dtype=float) * productive,
+        "meets_target": evaluation["meets_target"].astype(np.int64),
+        "understaffed": understaffed.astype(np.int64),
+        "positions": evaluation["positions"].astype(np.int64),
+    })
+    totals = weighted.groupby(["Roster", "Scenario"], observed=True).sum()
+
+    summary = pd.DataFrame({
+        "Intervals": totals["Intervals"],
+        "Service Level": totals["service_level"] / totals["calls"],
+        # NaN when no interval keeps up
+        "ASA": totals["asa"] / totals["answered_calls"],
+        # No productive positions at all leaves the occupancy undefined (NaN)
+        "Occupancy": totals["occupancy"] / totals["productive_positions"],
+        "Intervals Meeting Target": totals["meets_target"] / totals["Intervals"],
+        "Understaffed Intervals": totals["understaffed"],
+        "Sum of Positions": totals["positions"],
+    }).reset_index()
+    return summary.join(scenario_parameters, on="Scenario")[["Roster", "Scenario", *SCENARIO_COLUMNS, *summary.columns[2:]]]
@@ -0,0 +1,98 @@
+"""
+Parity of the vectorized engine with pyworkforce's scalar ErlangC, and input validation.
+"""
+import numpy as np
+import pytest
+
+import erlang_engine
+
+N_CELLS = 300
+
+
+def random_cells(seed, n=N_CELLS):
+    rng = np.random.default_rng(seed)
+    return {
+        "transactions": rng.choice([1, 2, 5, 10, 50, 100, 300, 800, 2000], n) * rng.uniform(0.5, 1.5, n),
+        "aht": rng.uniform(1, 10, n),
+        "asa": rng.uniform(0.1, 1, n),
+        "shrinkage": rng.choice([0, 0.2, 0.3, 0.4], n),
+        "service_level": rng.choice([0.8, 0.85, 0.9, 0.95], n),
+        "max_occupancy": rng.choice([0.7, 0.8, 0.9, 1.0], n),
+    }
+
+
+@pytest.mark.parametrize("interval", [15, 30])
+def test_required_positions_matches_pyworkforce(interval):
+    queuing = pytest.importorskip("pyworkforce.queuing")
+    cells = random_cells(interval)
+    result = erlang_engine.required_positions(**cells, interval=interval)
+
+    for i in range(N_CELLS):
+        expected = queuing.ErlangC(cells["transactions"][i], cells["aht"][i], cells["asa"][i], interval,
+                                   cells["shrinkage"][i]).required_positions(cells["service_level"][i],
+                                                                             cells["max_occupancy"][i])
+        assert result["raw_positions"][i] == expected["raw_positions"]
+        assert result["positions"][i] == expected["positions"]
+        for field in ["service_level", "occupancy", "waiting_probability"]:
+            assert result[field][i] == pytest.approx(expected[field], rel=1e-9, abs=1e-12)
+
+
+def test_achieved_service_matches_pyworkforce():
+    queuing = pytest.importorskip("pyworkforce.queuing")
+    cells = random_cells(1)
+    rng = np.random.default_rng(2)
+    required = erlang_engine.required_positions(**cells)
+    # Around the requirement, including positions that cannot keep up with the load
+    positions = np.maximum(0, required["positions"] + rng.integers(-10, 4, N_CELLS))
+    result = erlang_engine.achieved_service(cells["transactions"], cells["aht"], cells["asa"], positions, cells["shrinkage"])
+
+    assert np.array_equal(result["productive_positions"], np.floor(np.round(positions * (1 - cells["shrinkage"]), 9)))
+    for i in range(N_CELLS):
+        erlang = queuing.ErlangC(cells["transactions"][i], cells["aht"][i], cells["asa"][i], 30, 0)
+        servers = int(result["productive_positions"][i])
+        if servers > erlang.intensity:
+            waiting = erlang.waiting_probability(servers)
+            assert result["service_level"][i] == pytest.approx(erlang.service_level(servers), rel=1e-9, abs=1e-12)
+            assert result["waiting_probability"][i] == pytest.approx(waiting, rel=1e-9, abs=1e-12)
+            assert result["asa"][i] == pytest.approx(waiting * cells["aht"][i] / (servers - erlang.intensity), rel=1e-9)
+            assert result["occupancy"][i] == pytest.approx(erlang.intensity / servers)
+        else:
+            assert result["service_level"][i] == 0
+            assert result["waiting_probability"][i] == 1
+            assert np.isinf(result["asa"][i])
+
+
+def test_required_positions_meet_their_target_when_evaluated():
+    cells = random_cells(3)
+    required = erlang_engine.required_positions(**cells)
+    result = erlang_engine.achieved_service(cells["transactions"], cells["aht"], cells["asa"], required["positions"],
+                                            cells["shrinkage"])
+    assert np.all(result["productive_positions"] >= required["raw_positions"])
+    assert np.all(result["service_level"] >= cells["service_level"])
+
+
+@pytest.mark.parametrize("field", ["transactions", "aht", "asa", "shrinkage", "service_level", "max_occupancy"])
+@pytest.mark.parametrize("value", [np.nan, np.inf, -1.0])
+def test_required_positions_rejects_invalid_inputs(field, value):
+    cells = {"transactions": [50.0, 10.0], "aht": 3.0, "asa": 0.3, "shrinkage": 0.3, "service_level": 0.8,
+             "max_occupancy": 0.9}
+    cells[field] = [value, 10.0] if field == "transactions" else value
+    with pytest.raises(ValueError):
+        erlang_engine.required_positions(**cells)
+
+
+@pytest.mark.parametrize("field", ["transactions", "aht", "asa", "interval"])
+def test_required_positions_rejects_zero(field):
+    cells = {"transactions": 50.0, "aht": 3.0, "asa": 0.3, "shrinkage": 0.3, "service_level": 0.8, "interval": 30}
+    cells[field] = 0.0
+    with pytest.raises(ValueError):
+        erlang_engine.required_positions(**cells)
+
+
+@pytest.mark.parametrize("field", ["transactions", "aht", "asa", "positions", "shrinkage"])
+@pytest.mark.parametrize("value", [np.nan, np.inf, -1.0])
+def test_achieved_service_rejects_invalid_inputs(field, value):
+    cells = {"transactions": 50.0, "aht": 3.0, "asa": 0.3, "positions": 10.0, "shrinkage": 0.3}
+    cells[field] = value
+    with pytest.raises(ValueError):
+        erlang_engine.achieved_service(**cells)
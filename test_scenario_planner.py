@@ -0,0 +1,110 @@
+"""
+The planner's deduplicated dispatch and process pool against solving the same jobs directly
+with the engine, cancellation through the progress callback, and resizing the pool.
+"""
+import numpy as np
+import pytest
+
+import erlang_engine
+from scenario_planner import ScenarioPlanner
+
+
+def sweep_jobs(n_cells=2000, seed=0):
+    # Unit conversions such as 20 / 60 do not round-trip through the planner's 9-decimal keys
+    rng = np.random.default_rng(seed)
+    return {
+        "transactions": rng.choice([0.5, 3, 40, 120, 700], n_cells) * rng.choice([1, 1.1], n_cells),
+        "aht": rng.choice([300, 350, 400], n_cells) / 60,
+        "asa": rng.choice([10, 20, 30], n_cells) / 60,
+        "shrinkage": rng.choice([20, 30, 40], n_cells) / 100,
+        "service_level": rng.choice([80, 85, 90], n_cells) / 100,
+        "max_occupancy": rng.choice([70, 80, 90], n_cells) / 100,
+        "interval": 30,
+    }
+
+
+def assert_same_results(result, expected):
+    assert set(result) == set(expected)
+    for field, values in expected.items():
+        np.testing.assert_array_equal(result[field], values)
+
+
+def test_solve_equals_required_positions():
+    jobs = sweep_jobs()
+    stats = {}
+    result = ScenarioPlanner(n_workers=1).solve(jobs, stats=stats)
+
+    assert_same_results(result, erlang_engine.required_positions(**jobs))
+    assert stats["cells"] == len(jobs["transactions"])
+    assert stats["solved"] == stats["unique_cells"] < stats["cells"]
+
+
+class RecordingPlanner(ScenarioPlanner):
+    """
+    Keeps the futures of every chunk submitted to the pool
+    """
+    futures = None
+
+    def _get_executor(self):
+        executor = super()._get_executor()
+        if self.futures is None:
+            self.futures = []
+            submit = executor.submit
+
+            def recording_submit(*args, **kwargs):
+                self.futures.append(submit(*args, **kwargs))
+                return self.futures[-1]
+
+            executor.submit = recording_submit
+        return executor
+
+
+def test_pool_equals_inline_solving():
+    jobs = sweep_jobs(3000)
+    planner = ScenarioPlanner(n_workers=2, min_parallel_cells=0)
+    fractions = []
+    try:
+        result = planner.solve(jobs, progress=fractions.append)
+    finally:
+        planner.shutdown()
+
+    assert_same_results(result, ScenarioPlanner(n_workers=1).solve(jobs))
+    assert fractions[-1] == 1.0
+    assert fractions == sorted(fractions)
+
+
+def test_progress_callback_exception_cancels_queued_chunks():
+    class Rerun(Exception):
+        pass
+
+    def rerun(fraction):
+        raise Rerun
+
+    jobs = sweep_jobs(3000)
+    planner = RecordingPlanner(n_workers=2, min_parallel_cells=0, chunks_per_worker=25)
+    try:
+        with pytest.raises(Rerun):
+            planner.solve(jobs, progress=rerun)
+        assert len(planner.futures) == 50
+        assert any(future.cancelled() for future in planner.futures)
+        # The pool keeps serving later calls
+        assert_same_results(planner.solve(jobs), erlang_engine.required_positions(**jobs))
+    finally:
+        planner.shutdown()
+
+
+def test_resize_replaces_the_pool():
+    jobs = sweep_jobs(500)
+    planner = ScenarioPlanner(n_workers=2, min_parallel_cells=0)
+    try:
+        planner.solve(jobs)
+        executor = planner._executor
+        planner.resize(2)
+        assert planner._executor is executor
+
+        planner.resize(3)
+        assert planner.n_workers == 3 and planner._executor is None
+        assert_same_results(planner.solve(jobs), erlang_engine.required_positions(**jobs))
+        assert planner._executor._max_workers == 3
+    finally:
+        planner.shutdown()
@@ -0,0 +1,57 @@
+"""
+The SQLite solution cache on its own and behind the planner.
+"""
+import numpy as np
+
+from scenario_planner import ScenarioPlanner
+from solution_cache import SolutionCache, solution_key
+from test_scenario_planner import assert_same_results, sweep_jobs
+
+
+def results(n_cells, value):
+    return {"raw_positions": np.full(n_cells, value), "positions": np.full(n_cells, value + 1),
+            "service_level": np.full(n_cells, 0.8), "occupancy": np.full(n_cells, 0.7),
+            "waiting_probability": np.full(n_cells, 0.25)}
+
+
+def test_round_trip_and_hit_rate():
+    cache = SolutionCache(":memory:")
+    cache.put({"a": results(3, 5)})
+
+    found = cache.get(["a", "b"])
+    assert list(found) == ["a"]
+    assert_same_results(found["a"], results(3, 5))
+    assert found["a"]["positions"].dtype == np.int64
+    assert cache.hit_rate == 0.5
+
+
+def test_evicts_least_recently_used_beyond_max_cells():
+    cache = SolutionCache(":memory:", max_cells=10)
+    cache.put({"a": results(4, 1)})
+    cache.put({"b": results(4, 2)})
+    cache.get(["a"])
+    cache.put({"c": results(4, 3)})
+    assert set(cache.get(["a", "b", "c"])) == {"a", "c"}
+
+
+def test_keys_follow_the_normalized_cells():
+    keys = np.array([[10.0, 5.0, 1 / 3, 0.3, 0.8, 0.9, 30.0]])
+    assert solution_key(keys) == solution_key(keys.copy())
+    assert solution_key(keys) != solution_key(keys * 2)
+
+
+def test_planner_serves_solved_groups_from_the_cache(tmp_path):
+    jobs = sweep_jobs(600)
+    groups = [200, 250, 150]
+    path = str(tmp_path / "solutions.sqlite")
+    ScenarioPlanner(n_workers=1, cache=SolutionCache(path)).solve(jobs, groups=groups)
+    # A new cache on the same file, as after a restart; the last group has new inputs
+    cache = SolutionCache(path)
+    jobs["transactions"] = jobs["transactions"].copy()
+    jobs["transactions"][-1] += 1
+    stats = {}
+    result = ScenarioPlanner(n_workers=1, cache=cache).solve(jobs, stats=stats, groups=groups)
+
+    assert_same_results(result, ScenarioPlanner(n_workers=1).solve(jobs))
+    assert stats["cache_hits"] == 450
+    assert cache.hits == 2 and cache.misses == 1
@@ -0,0 +1,187 @@
+"""
+Blank editor cells and the headless sweep, and long-format forecast validation.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from staffing_engine import (build_scenarios, build_total_staffing, calculate_portfolio, calculate_staffing, changed_cells,
+                             daily_position_totals, empty_table, evaluate_rosters, flatten_cells, make_days, make_intervals,
+                             patch_staffing, portfolio_totals, prepare_forecast, scenario_daily_totals, summarize_rosters,
+                             summarize_scenarios)
+
+
+def test_blank_cells_are_skipped_like_empty_intervals():
+    days, intervals = make_days(), make_intervals()
+    calls_df = empty_table(days, intervals)
+    calls_df.iloc[3, 2] = np.nan
+    calls_df.iloc[4, 2] = 100
+    aht_df = empty_table(days, intervals) + 300
+    aht_df.iloc[4, 2] = np.nan
+
+    fixed_aht, = calculate_staffing(calls_df, None, build_scenarios([20], [30], [85], [300], [80]), days, intervals)
+    table_aht, = calculate_staffing(calls_df, aht_df, build_scenarios([20], [30], [85], None, [80]), days, intervals)
+    assert list(fixed_aht.index) == [2 * len(intervals) + 4]
+    assert len(table_aht) == 0
+
+
+def weekly_calls(days, intervals, seed=0):
+    rng = np.random.default_rng(seed)
+    calls = pd.DataFrame(rng.integers(0, 150, (len(intervals), len(days))).astype(float), index=intervals, columns=days)
+    calls["Saturday"] = 0  # A day with nothing to staff
+    return calls
+
+
+def test_grouped_rollups_equal_per_scenario_rollups():
+    days, intervals = make_days(), make_intervals()
+    calls_df = weekly_calls(days, intervals)
+    scenarios = build_scenarios([20.0], [30.0], [85.0], [300.0, 6000.0], [80.0, 90.0])
+    staffing_frames = calculate_staffing(calls_df, None, scenarios, days, intervals)
+    staffing_frames.append(staffing_frames[0].iloc[:0])  # A scenario with no interval to staff
+    scenarios.append(scenarios[0])
+
+    daily_totals = scenario_daily_totals(staffing_frames, days)
+    for staffing_df, totals in zip(staffing_frames, daily_totals):
+        pd.testing.assert_frame_equal(totals, daily_position_totals(staffing_df))
+
+    summary = summarize_scenarios(scenarios, staffing_frames, daily_totals, 7.5, 5.0, days)
+    for number, totals in enumerate(daily_totals):
+        total_staffing = build_total_staffing(totals, 7.5, 5.0, days)
+        row = summary.iloc[number]
+        assert row["Sum of Positions"] == totals["positions"].sum()
+        for name in ["Maximum Value", "Sum of the Week", "Divided by Working Days"]:
+            assert row[name] == pytest.approx(total_staffing[name].max(), nan_ok=True)
+    assert np.isnan(summary["Divided by Working Days"].iloc[-1])
+
+
+@pytest.mark.parametrize("aht_table", [False, True])
+def test_patched_results_equal_a_full_recompute(aht_table):
+    days, intervals = make_days(), make_intervals()
+    calls_df = weekly_calls(days, intervals)
+    aht_df = weekly_calls(days, intervals, seed=1) + 200 if aht_table else None
+    scenarios = build_scenarios([20.0, 30.0], [30.0], [85.0], None if aht_table else [300.0], [80.0])
+    staffing_frames = calculate_staffing(calls_df, aht_df, scenarios, days, intervals)
+    snapshot = {"calls": flatten_cells(calls_df, days), "aht": flatten_cells(aht_df, days) if aht_table else None}
+
+    edited_calls = calls_df.copy()
+    edited_calls.iloc[10, 1] += 40
+    edited_calls.iloc[11, 2] = 0
+    edited_calls["Sunday"] = 0  # Every call of a day cleared
+    edited_calls.iloc[5, 6] = 25  # A call on a day that had none
+    edited_aht = aht_df
+    if aht_table:
+        edited_aht = aht_df.copy()
+        edited_aht.iloc[20, 3] = 0
+
+    changed = changed_cells(snapshot, edited_calls, edited_aht, days)
+    updates = calculate_staffing(edited_calls, edited_aht, scenarios, days, intervals, cells=changed)
+    full_frames = calculate_staffing(edited_calls, edited_aht, scenarios, days, intervals)
+    for staffing_df, update_df, full_df in zip(staffing_frames, updates, full_frames):
+        patched_df, patched_totals = patch_staffing(staffing_df, daily_position_totals(staffing_df), update_df, changed)
+        pd.testing.assert_frame_equal(patched_df, full_df)
+        pd.testing.assert_frame_equal(patched_totals, daily_position_totals(full_df))
+        pd.testing.assert_frame_equal(build_total_staffing(patched_totals, 8.0, 5.0, days),
+                                      build_total_staffing(daily_position_totals(full_df), 8.0, 5.0, days))
+
+
+def test_required_positions_roster_meets_every_target():
+    days, intervals = make_days(), make_intervals()
+    calls_df = weekly_calls(days, intervals)
+    scenarios = build_scenarios([20.0], [30.0], [85.0], [300.0], [80.0])
+    staffing_df, = calculate_staffing(calls_df, None, scenarios, days, intervals)
+    positions = np.zeros(len(days) * len(intervals))
+    positions[staffing_df.index] = staffing_df["positions"]  # Cells are numbered day-major
+    roster = pd.DataFrame(positions.reshape(len(days), len(intervals)).T, index=intervals, columns=days)
+
+    evaluation = evaluate_rosters(calls_df, None, {"Required": roster}, scenarios, days, intervals)
+    assert len(evaluation) == len(staffing_df)
+    assert evaluation["meets_target"].all()
+    assert summarize_rosters(evaluation, scenarios)["Intervals Meeting Target"].item() == 1
+
+
+def test_roster_summary_weights():
+    days, intervals = make_days(), make_intervals()
+    calls_df = weekly_calls(days, intervals)
+    scenarios = build_scenarios([20.0, 30.0], [30.0], [85.0], [300.0], [80.0])
+    rosters = {"Thin": empty_table(days, intervals) + 8, "Wide": empty_table(days, intervals) + 30}
+    evaluation = evaluate_rosters(calls_df, None, rosters, scenarios, days, intervals)
+    summary = summarize_rosters(evaluation, scenarios)
+
+    assert len(summary) == 4
+    for _, row in summary.iterrows():
+        cells = evaluation[(evaluation["Roster"] == row["Roster"]) & (evaluation["Scenario"] == row["Scenario"])]
+        calls = cells["calls"].to_numpy(dtype=float)
+        keeping_up = np.isfinite(cells["asa"].to_numpy())
+        assert row["AWT"] == scenarios[row["Scenario"]][0]
+        assert row["Intervals"] == len(cells)
+        assert row["Service Level"] == pytest.approx(np.average(cells["service_level"], weights=calls))
+        assert row["ASA"] == pytest.approx(np.average(cells["asa"][keeping_up], weights=calls[keeping_up]))
+        assert row["Occupancy"] == pytest.approx(np.average(cells["occupancy"], weights=cells["productive_positions"]))
+        assert row["Intervals Meeting Target"] == pytest.approx(cells["meets_target"].mean())
+        assert row["Understaffed Intervals"] == (~keeping_up).sum()
+        assert row["Sum of Positions"] == cells["positions"].sum()
+    # The thin roster cannot keep up with the peaks, yet its ASA stays finite
+    thin = summary[summary["Roster"] == "Thin"]
+    assert (thin["Understaffed Intervals"] > 0).all() and np.isfinite(thin["ASA"]).all()
+
+
+def long_forecast(intervals, **columns):
+    forecast = pd.DataFrame({"queue": "Sales", "site": "Leeds", "date": "2024-01-07", "interval": intervals,
+                             "calls": 100.0})
+    return forecast.assign(**columns)
+
+
+def test_forecast_without_aht_needs_scenario_ahts():
+    forecast = prepare_forecast(long_forecast(["08:00", "08:30"]), 30)
+    assert "aht" not in forecast.columns
+    with pytest.raises(ValueError, match="aht column"):
+        calculate_portfolio(forecast, build_scenarios([20], [30], [85], None, [80]))
+    assert len(calculate_portfolio(forecast, build_scenarios([20], [30], [85], [300], [80]))) == 2
+
+
+@pytest.mark.parametrize("column", ["calls", "aht"])
+def test_forecast_rejects_negative_values(column):
+    forecast = long_forecast(["08:00", "08:30"], aht=300.0)
+    forecast.loc[1, column] = -1
+    with pytest.raises(ValueError, match=column):
+        prepare_forecast(forecast, 30)
+
+
+def test_forecast_may_leave_out_intervals():
+    # Hourly gaps in a 30-minute forecast are empty intervals, not a different interval length
+    prepare_forecast(long_forecast(["08:00", "09:00", "10:00"]), 30)
+    with pytest.raises(ValueError, match="not a multiple"):
+        prepare_forecast(long_forecast(["08:00", "08:15", "08:30"]), 30)
+
+
+def table_forecast(calls_df, queue, first_date="2024-01-07"):
+    # The calls table's Sunday..Saturday as a long-format week starting on a Sunday
+    dates = pd.date_range(first_date, periods=len(calls_df.columns), freq="D")
+    forecast = calls_df.set_axis(dates, axis=1).stack().rename("calls").reset_index()
+    forecast.columns = ["interval", "date", "calls"]
+    return forecast.assign(queue=queue, site="Leeds", interval=forecast["interval"].astype(str))
+
+
+def test_portfolio_rollups_equal_single_table_total_staffing():
+    days, intervals = make_days(), make_intervals()
+    tables = {"Sales": weekly_calls(days, intervals), "Service": weekly_calls(days, intervals, seed=1) * 2}
+    scenarios = build_scenarios([20.0, 30.0], [30.0], [85.0], [300.0], [80.0])
+    forecast = prepare_forecast(pd.concat([table_forecast(calls_df, queue) for queue, calls_df in tables.items()]), 30)
+
+    staffing = calculate_portfolio(forecast, scenarios)
+    dates = list(pd.date_range("2024-01-07", periods=7, freq="D"))
+    queue_totals, totals = portfolio_totals(staffing, scenarios, dates, 8.0, 5.0)
+
+    columns = ["Sum of Positions", "Maximum Value", "Sum of the Week", "Divided by Working Days"]
+    for queue, calls_df in tables.items():
+        for number, staffing_df in enumerate(calculate_staffing(calls_df, None, scenarios, days, intervals)):
+            total_staffing = build_total_staffing(daily_position_totals(staffing_df), 8.0, 5.0, days)
+            row = queue_totals[(queue_totals["queue"] == queue) & (queue_totals["Scenario"] == number)].iloc[0]
+            assert row["Sum of Positions"] == total_staffing["Sum of Positions"].sum()
+            for name in columns[1:]:
+                assert row[name] == pytest.approx(total_staffing[name].max())
+            assert row["AWT"] == scenarios[number][0]
+
+    # Weekly totals and FTE add up across queues; the peak day does not have to
+    by_scenario = queue_totals.groupby("Scenario")[["Sum of Positions", "Sum of the Week", "Divided by Working Days"]].sum()
+    pd.testing.assert_frame_equal(totals.set_index("Scenario")[by_scenario.columns], by_scenario, check_dtype=False)